@@ -0,0 +1,61 @@
+import numpy as np
+from scipy import signal
+
+
+# Coarse-to-fine sweep of w for one k. Starts with a coarse grid plus the seed
+# frequencies (e.g. the theoretical harmonics), and after every batch adds the
+# midpoints around the highest local maxima of max amplitude vs w, until the
+# samples around each of them are at most resolution apart.
+class AdaptiveSweep:
+    def __init__(
+        self, w_min, w_max, seeds=(), coarse_points=10, resolution=0.05, peaks=3
+    ):
+        self.w_min = w_min
+        self.w_max = w_max
+        self.resolution = resolution
+        self.peaks = peaks
+        self.samples = {}
+        self.attempted = set()
+
+        seeds = [w for w in seeds if w_min <= w <= w_max]
+        self.pending = sorted(
+            set(np.linspace(w_min, w_max, coarse_points).tolist()) | set(seeds)
+        )
+
+    def done(self):
+        return len(self.pending) == 0
+
+    # ws to simulate in the next batch
+    def next_batch(self):
+        return list(self.pending)
+
+    # Records the max amplitudes of the last batch and plans the next one. ws
+    # of the batch missing here (failed runs) are not retried.
+    def update(self, ws, amplitudes):
+        for w, amplitude in zip(ws, amplitudes):
+            self.samples[w] = amplitude
+
+        self.attempted.update(self.pending)
+        self.pending = []
+
+        if len(self.samples) < 3:
+            return
+
+        ws, amplitudes = self.curve()
+
+        peaks, _ = signal.find_peaks(amplitudes)
+        peaks = sorted(peaks, key=lambda i: amplitudes[i], reverse=True)[: self.peaks]
+
+        refined = set()
+        for i in peaks:
+            for j in (i - 1, i + 1):
+                if abs(ws[i] - ws[j]) > self.resolution:
+                    refined.add((ws[i] + ws[j]) / 2)
+
+        self.pending = sorted(refined - self.attempted)
+
+    # Sampled (ws, max amplitudes) sorted by w
+    def curve(self):
+        ws = np.array(sorted(self.samples))
+        amplitudes = np.array([self.samples[w] for w in ws])
+        return ws, amplitudes
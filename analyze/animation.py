@@ -0,0 +1,453 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import concurrent.futures
+import matplotlib
+import numpy as np
+from matplotlib.animation import FuncAnimation, FFMpegWriter
+import matplotlib.pyplot as plt
+import render
+
+# Segments shorter than this are not worth a worker of their own
+MIN_SEGMENT_FRAMES = 100
+
+# Rows read at once when looking for the axes limits of an animation
+LIMITS_BLOCK_SIZE = 4096
+
+
+# Renders frames [start, stop) of the chain animation (all of them by default).
+# The axes limits come from the whole run unless limits gives them as
+# (min_y, max_y), so segments rendered apart match the full animation. times
+# holds the time of every row of positions, by default (row + 1) * dt.
+def animate(
+    positions,
+    l0,
+    omega,
+    dt,
+    A,
+    output_file="data/animation.mp4",
+    start=0,
+    stop=None,
+    progress=True,
+    times=None,
+    fps=10,
+    limits=None,
+):
+    # Convert positions to a NumPy array for easier indexing
+    positions = np.asarray(positions)
+
+    # Number of particles is the length of each snapshot
+    num_particles = positions.shape[1]
+
+    # Fixed x-coordinates based on L0 separation
+    x_coords = np.arange(num_particles) * l0
+
+    # Set up the figure and axis
+    fig, ax = plt.subplots()
+    ax.set_xlim(
+        -2 * l0, l0 * num_particles
+    )  # Fixed x-limits based on particle separation
+    min_y, max_y = limits if limits is not None else _limits(positions)
+    extra = (max_y - min_y) / 5
+    ax.set_ylim(
+        min_y - extra, max_y + extra
+    )  # Dynamic y-limits based on particle movement
+
+    ax.set_xticks([])
+    ax.set_yticks([])
+
+    # Initialize the scatter plot for particles
+    (particles,) = ax.plot([], [], "bo", ms=1)  # 'bo' means blue circles
+
+    # Line objects for connecting particles and the wall
+    (particle_lines,) = ax.plot([], [], "b-", lw=1)  # Lines between particles
+    (wall_line,) = ax.plot([], [], "b-", lw=1)
+    # Forced particle that follows the A * sin(ωt) function
+    # Initialize the particle at the leftmost particle's position
+    (forced_particle,) = ax.plot([-l0], [0], "go", ms=2)
+
+    stop = len(positions) if stop is None else stop
+    frames = stop - start
+
+    def update(frame):
+        # Print progress every 5% of frames, if frames is greater than 20
+        if progress and frames > 20 and (frame - start) % (frames // 20) == 0:
+            print(f"Progress: {(frame - start) / frames * 100:.1f}%")
+
+        # Update particle positions
+        particles.set_data(x_coords, positions[frame])  # Fixed x, dynamic y
+
+        # Update lines between particles
+        particle_lines.set_data(x_coords, positions[frame])  # Connect particles
+
+        # Update line to the wall at y=0 from the rightmost particle
+        wall_line.set_data(
+            [x_coords[-1], x_coords[-1] + l0], [positions[frame][-1], 0]
+        )  # Rightmost particle to wall
+
+        # Update the forced particle
+        t = times[frame] if times is not None else (frame + 1) * dt
+        forced_particle.set_data([-l0], [A * np.sin(omega * t)])
+
+        return particles, particle_lines, wall_line, forced_particle
+
+    # Create the animation
+    ani = FuncAnimation(fig, update, frames=range(start, stop), interval=100, blit=True)
+
+    # Save the animation as an MP4 file
+    writer = FFMpegWriter(fps=fps, metadata=dict(artist="Me"), bitrate=1800)
+    ani.save(output_file, writer=writer)
+
+    plt.close()  # Close the figure to avoid displaying it in interactive mode
+
+
+# Frame size of rasterize (the default matplotlib figure size) and colors of
+# the chain and of the forced particle, as in animate
+RASTER_WIDTH = 640
+RASTER_HEIGHT = 480
+CHAIN_COLOR = (0, 0, 255)
+FORCED_COLOR = (0, 128, 0)
+
+
+# Pixel columns of a polyline through xs (in pixels, increasing), worked out
+# once per animation. Each column gathers the vertices that fall in it and the
+# line at its two edges; the line is continuous, so the pixels it covers in the
+# column are the span between the lowest and highest of them.
+def _polyline_columns(xs, width):
+    first = max(int(np.rint(xs[0])), 0)
+    last = min(int(np.rint(xs[-1])), width - 1)
+    count = last - first + 1
+
+    edges = np.clip(np.arange(first, last + 2) - 0.5, xs[0], xs[-1])
+    vertex_columns = np.clip(np.rint(xs).astype(np.int64), first, last) - first
+
+    groups = np.concatenate([vertex_columns, np.arange(count), np.arange(count)])
+    order = np.argsort(groups, kind="stable")
+    starts = np.searchsorted(groups[order], np.arange(count))
+
+    return first, edges, order, starts
+
+
+# Draws the polyline through (xs, ys) as one vertical span per column, so the
+# cost per frame is bounded by the frame size rather than by the number or the
+# length of the segments
+def _draw_polyline(frame, columns, xs, ys, color):
+    first, edges, order, starts = columns
+
+    at_edges = np.interp(edges, xs, ys)
+    values = np.concatenate([ys, at_edges[:-1], at_edges[1:]])[order]
+    top = np.rint(np.minimum.reduceat(values, starts))
+    bottom = np.rint(np.maximum.reduceat(values, starts))
+
+    # Spans clipped to the frame, then flattened into pixel indices
+    top = np.clip(top, 0, frame.shape[0]).astype(np.int64)
+    bottom = np.clip(bottom, -1, frame.shape[0] - 1).astype(np.int64)
+    lengths = np.maximum(bottom - top + 1, 0)
+
+    ends = np.cumsum(lengths)
+    rows = np.arange(ends[-1]) - np.repeat(ends - lengths - top, lengths)
+    columns = np.repeat(np.arange(first, first + len(starts)), lengths)
+    frame[rows, columns] = color
+
+
+def _draw_dots(frame, xs, ys, radius, color):
+    offsets = np.arange(-radius, radius + 1)
+    dot_xs = np.rint(xs).astype(np.int64)[:, None, None] + offsets[None, None, :]
+    dot_ys = np.rint(ys).astype(np.int64)[:, None, None] + offsets[None, :, None]
+    dot_xs, dot_ys = np.broadcast_arrays(dot_xs, dot_ys)
+
+    inside = (
+        (dot_xs >= 0)
+        & (dot_xs < frame.shape[1])
+        & (dot_ys >= 0)
+        & (dot_ys < frame.shape[0])
+    )
+    frame[dot_ys[inside], dot_xs[inside]] = color
+
+
+# Same animation as animate, drawn with NumPy into a preallocated RGB frame and
+# piped to ffmpeg as rawvideo instead of going through matplotlib artists
+def rasterize(
+    positions,
+    l0,
+    omega,
+    dt,
+    A,
+    output_file="data/animation.mp4",
+    start=0,
+    stop=None,
+    progress=True,
+    times=None,
+    fps=10,
+    width=RASTER_WIDTH,
+    height=RASTER_HEIGHT,
+    limits=None,
+):
+    positions = np.asarray(positions)
+    num_particles = positions.shape[1]
+    stop = len(positions) if stop is None else stop
+    frames = stop - start
+
+    # Same limits as animate, mapped to pixels (y grows downwards)
+    min_y, max_y = limits if limits is not None else _limits(positions)
+    extra = (max_y - min_y) / 5
+    bottom = min_y - extra
+    span_y = (max_y + extra - bottom) or 1.0
+    left = -2 * l0
+    span_x = l0 * num_particles - left
+
+    def to_x(x):
+        return (np.asarray(x, dtype=np.float64) - left) / span_x * (width - 1)
+
+    def to_y(y):
+        return (1 - (np.asarray(y, dtype=np.float64) - bottom) / span_y) * (height - 1)
+
+    x_pixels = to_x(np.arange(num_particles) * l0)
+    forced_x = to_x([-l0])
+
+    # The chain and its link to the wall at y=0, as one polyline
+    chain_x = np.append(x_pixels, to_x(num_particles * l0))
+    chain_columns = _polyline_columns(chain_x, width)
+    wall_y = to_y([0.0])
+
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    process = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-framerate",
+            str(fps),
+            "-i",
+            "pipe:",
+            "-vcodec",
+            "h264",
+            "-pix_fmt",
+            "yuv420p",
+            "-b:v",
+            "1800k",
+            output_file,
+        ],
+        stdin=subprocess.PIPE,
+    )
+
+    try:
+        for frame_index in range(start, stop):
+            if progress and frames > 20 and (frame_index - start) % (frames // 20) == 0:
+                print(f"Progress: {(frame_index - start) / frames * 100:.1f}%")
+
+            y_pixels = to_y(positions[frame_index])
+            t = times[frame_index] if times is not None else (frame_index + 1) * dt
+
+            frame.fill(255)
+
+            # Springs between particles, then the link to the wall at y=0
+            _draw_polyline(
+                frame,
+                chain_columns,
+                chain_x,
+                np.append(y_pixels, wall_y),
+                CHAIN_COLOR,
+            )
+            _draw_dots(frame, x_pixels, y_pixels, 1, CHAIN_COLOR)
+            _draw_dots(frame, forced_x, to_y([A * np.sin(omega * t)]), 2, FORCED_COLOR)
+
+            process.stdin.write(frame.data)
+    finally:
+        process.stdin.close()
+        process.wait()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+# Indices of the rows of a run to animate. Rows are limited to the [start, end]
+# time window and, when frames is given, decimated to about that many: by
+# "stride", evenly spaced, or by "envelope", the row of largest amplitude in
+# each of frames equal slices, which keeps the peaks of the envelope.
+def select_frames(
+    time, amplitudes=None, start=None, end=None, frames=None, method="stride"
+):
+    time = np.asarray(time)
+
+    window = np.ones(len(time), dtype=bool)
+    if start is not None:
+        window &= time >= start
+    if end is not None:
+        window &= time <= end
+    rows = np.nonzero(window)[0]
+
+    if len(rows) == 0:
+        covered = f", the run covers {time[0]} to {time[-1]}" if len(time) else ""
+        raise ValueError(f"No snapshots between start={start} and end={end}{covered}")
+
+    if frames is None or frames >= len(rows):
+        return rows
+
+    if method == "stride":
+        return rows[
+            np.unique(np.rint(np.linspace(0, len(rows) - 1, frames)).astype(int))
+        ]
+
+    if method == "envelope":
+        amplitudes = np.asarray(amplitudes)[rows]
+        bounds = np.linspace(0, len(rows), frames + 1).astype(int)
+        return rows[
+            [
+                bounds[i] + np.argmax(amplitudes[bounds[i] : bounds[i + 1]])
+                for i in range(frames)
+            ]
+        ]
+
+    raise ValueError(f"Unknown frame selection method: {method}")
+
+
+# Lowest and highest position of the given rows (all by default), read block
+# by block so memory-mapped positions are never loaded whole
+def _limits(positions, rows=None):
+    rows = np.arange(len(positions)) if rows is None else np.asarray(rows)
+    if len(rows) == 0:
+        raise ValueError("No frames to animate")
+
+    lows = []
+    highs = []
+    for start in range(0, len(rows), LIMITS_BLOCK_SIZE):
+        block = np.asarray(positions[rows[start : start + LIMITS_BLOCK_SIZE]])
+        lows.append(np.min(block))
+        highs.append(np.max(block))
+
+    return min(lows), max(highs)
+
+
+def _animate_segment(renderer, animation, output_file, start, stop, limits):
+    positions = render.resolve(animation["positions"])
+
+    # Only the rows of this segment are read from the memory-mapped positions
+    rows = animation.get("rows")
+    rows = np.arange(start, stop) if rows is None else np.asarray(rows)[start:stop]
+    times = animation.get("times")
+    times = (rows + 1) * animation["dt"] if times is None else times[start:stop]
+
+    renderer(
+        np.asarray(positions[rows]),
+        animation["l0"],
+        animation["omega"],
+        animation["dt"],
+        animation["A"],
+        output_file,
+        progress=False,
+        times=np.asarray(times),
+        fps=animation.get("fps", 10),
+        limits=limits,
+    )
+    return output_file
+
+
+# Joins the segments without re-encoding them
+def concat_videos(segment_files, output_file):
+    list_file = output_file + ".segments.txt"
+
+    with open(list_file, "w") as f:
+        for segment_file in segment_files:
+            f.write(f"file '{os.path.abspath(segment_file)}'\n")
+
+    try:
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_file,
+                "-c",
+                "copy",
+                output_file,
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        os.remove(list_file)
+
+
+def _segments(frames, workers):
+    count = max(1, min(workers, frames // MIN_SEGMENT_FRAMES))
+    bounds = np.linspace(0, frames, count + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Renders every animation in parallel: each one is split into segments rendered
+# by separate workers, then joined with the ffmpeg concat demuxer. animations
+# holds dicts with the arguments of animate; positions may be a render.column
+# reference so workers memory-map it, and rows (see select_frames) the rows of
+# it to animate, with their times. renderer is animate or rasterize.
+def animate_all(animations, max_workers=None, renderer=animate):
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as executor:
+        jobs = []
+
+        for animation in animations:
+            positions = render.resolve(animation["positions"])
+            rows = animation.get("rows")
+            frames = len(rows) if rows is not None else len(positions)
+
+            if frames == 0:
+                print(f"Skipping {animation['output_file']}: no frames to animate")
+                continue
+
+            # From every frame, so the segments match
+            limits = _limits(positions, rows)
+            segment_dir = tempfile.mkdtemp(
+                prefix="segments-", dir=os.path.dirname(animation["output_file"]) or "."
+            )
+
+            futures = [
+                executor.submit(
+                    _animate_segment,
+                    renderer,
+                    animation,
+                    os.path.join(segment_dir, f"segment-{i:04d}.mp4"),
+                    start,
+                    stop,
+                    limits,
+                )
+                for i, (start, stop) in enumerate(_segments(frames, workers))
+            ]
+            jobs.append((animation["output_file"], segment_dir, futures))
+
+        failed = 0
+
+        for output_file, segment_dir, futures in jobs:
+            try:
+                segment_files = [future.result() for future in futures]
+                concat_videos(segment_files, output_file)
+                print(f"Animation saved to {output_file}")
+            except Exception as e:
+                print(f"Error rendering {output_file}: {e}")
+                failed += 1
+            finally:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+
+    return failed
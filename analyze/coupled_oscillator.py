@@ -1,69 +1,372 @@
 import os
-import shutil
 import subprocess
-import concurrent.futures
 import numpy as np
-from scipy import signal
 import utils
-import json
+import metrics
+import chain_engine
+import adaptive_sweep
+import fitting
+import frequency_response
+import modal
+import normal_modes
+import pipeline
+import results_store
+import simulation_cache
+import scheduler
 import plots
+import render
+import animation
 import sys
 
 
-def execute_simulation(
-    k, m, A, l0, N, w, i, dt, dt2, tf, memory, root_dir="data/simulations"
-):
+JAR = "target/coupled-oscillator-jar-with-dependencies.jar"
+
+# Streamed runs stop once their envelope grows by less than this (relative)
+# over the monitoring window, or once it passes this many times A
+STREAM_TOLERANCE = 1e-3
+STREAM_DIVERGENCE = 100
+
+# Lowest normal modes whose energy is kept for every run (see
+# utils.ModalReducer)
+MODAL_MODES = 3
+
+# ws of the theoretical amplitude vs w curve drawn over each sweep
+RESPONSE_POINTS = 2000
+
+
+# Runs a scheduler.Batch in a single JVM. Yields the directory, or the error,
+# of each of its simulations as soon as it finishes.
+def execute_batch(m, A, l0, N, i, batch, cache):
 
-    name = f"w-{w}_k-{k}"
-    unique_dir = os.path.join(root_dir, name)
-
-    # If unique dir exists return it
-    if os.path.exists(unique_dir):
-        return unique_dir
-
-    os.makedirs(unique_dir, exist_ok=True)
-
-    command = [
-        "java",
-        f"-Xms{memory}",
-        f"-Xmx{memory}",
-        "-jar",
-        "target/coupled-oscillator-jar-with-dependencies.jar",
-        "-out",
-        unique_dir,
-        "-k",
-        str(k),
-        "-m",
-        str(m),
-        "-A",
-        str(A),
-        "-l0",
-        str(l0),
-        "-N",
-        str(N),
-        "-w",
-        str(w),
-        "-i",
-        i,
-        "-dt",
-        str(dt),
-        "-dt2",
-        str(dt2),
-        "-tf",
-        str(tf),
+    parameters_list = [
+        {
+            "k": k,
+            "m": m,
+            "A": A,
+            "l0": l0,
+            "N": N,
+            "w": param["w"],
+            "i": i,
+            "dt": param["dt"],
+            "dt2": param["dt2"],
+            "tf": param["tf"],
+        }
+        for k, param in batch.parameters
     ]
 
+    print(
+        f"[WORKER] - Running {len(parameters_list)} simulations, "
+        f"{batch.threads} at once"
+    )
+    for index, dir in cache.execute_batch(
+        JAR,
+        parameters_list,
+        java_options=[f"-Xms{batch.memory}", f"-Xmx{batch.memory}"],
+        threads=batch.threads,
+    ):
+        parameters = parameters_list[index]
+
+        if isinstance(dir, subprocess.CalledProcessError):
+            print(
+                f"[WORKER] - Error running simulation, "
+                f"w={parameters['w']}, k={parameters['k']}"
+            )
+            print(f"[WORKER] - {dir.stderr}")
+        else:
+            print(
+                f"[WORKER] - Simulation finished, "
+                f"w={parameters['w']}, k={parameters['k']}"
+            )
+
+        yield dir
+
+
+# Parses and reduces one simulation directory. Runs in the analysis pool.
+def analyze_simulation(dir, combinations_to_animate):
+    static_file = os.path.join(dir, "static.txt")
+    dynamic_file = os.path.join(dir, "dynamic.txt")
+
+    static_data = utils.parse_static_file_coupled(static_file)
+
+    if (static_data["K"], static_data["W"]) in combinations_to_animate:
+        time, positions = utils.parse_dynamic_file(dynamic_file, max_workers=1)
+        return build_animated_result(static_data, time, positions)
+
+    # Only the amplitudes and mode energies are needed, stream the positions
+    modal = utils.ModalReducer(
+        static_data["K"], static_data["M"], static_data["N"], MODAL_MODES
+    )
+    reduction = utils.reduce_dynamic_file(dynamic_file, reducers=[modal])
+
+    return {
+        "parameters": static_data,
+        "time": reduction["time"],
+        "amplitudes": reduction["amplitudes"],
+        "mode_energies": modal.result()["mode_energies"],
+        "k": static_data["K"],
+        "w": static_data["W"],
+    }
+
+
+def build_animated_result(static_data, time, positions):
+    run_metrics = metrics.compute_metrics(
+        positions,
+        dt=static_data["Dt2"],
+        m=static_data["M"],
+        k=static_data["K"],
+        left=static_data["A"] * np.sin(static_data["W"] * time),
+    )
+
+    modal = utils.ModalReducer(
+        static_data["K"], static_data["M"], static_data["N"], MODAL_MODES
+    )
+    modal.update(time, positions)
+
+    return {
+        "parameters": static_data,
+        "time": np.array(time),
+        "amplitudes": run_metrics["amplitudes"],
+        "kinetic_energy": run_metrics["kinetic_energy"],
+        "potential_energy": run_metrics["potential_energy"],
+        "mode_energies": modal.result()["mode_energies"],
+        "positions": np.array(positions),
+        "k": static_data["K"],
+        "w": static_data["W"],
+    }
+
+
+# Same values parse_static_file_coupled reads from static.txt
+def build_static_data(m, k, A, l0, N, i, param):
+    return {
+        "M": float(m),
+        "K": float(k),
+        "A": float(A),
+        "L0": float(l0),
+        "N": int(N),
+        "W": float(param["w"]),
+        "Dt": float(param["dt"]),
+        "Dt2": float(param["dt2"]),
+        "Tf": float(param["tf"]),
+        "Integrator": i,
+    }
+
+
+# Runs the jar with -stream, reading the snapshots from its stdout as they are
+# taken instead of from dynamic.txt. The run is stopped as soon as the
+# utils.EnvelopeMonitor decides its envelope converged or diverged; runs that
+# record positions always go up to tf.
+def execute_simulation_stream(
+    k,
+    m,
+    A,
+    l0,
+    N,
+    w,
+    i,
+    dt,
+    dt2,
+    tf,
+    memory,
+    record_positions=False,
+    window=None,
+    tolerance=1e-3,
+    limit=np.inf,
+):
+
+    param = {"w": w, "dt": dt, "dt2": dt2, "tf": tf}
+    arguments = {"k": k, "m": m, "A": A, "l0": l0, "N": N, "i": i, **param}
+
+    command = ["java", f"-Xms{memory}", f"-Xmx{memory}", "-jar", JAR]
+    for name, value in arguments.items():
+        command += [f"-{name}", str(value)]
+    command.append("-stream")
+
+    # 20 periods of the driver by default
+    monitor = utils.EnvelopeMonitor(
+        window if window is not None else 20 * 2 * np.pi / w, tolerance, limit
+    )
+
+    modal = utils.ModalReducer(k, m, N, MODAL_MODES)
+
+    time = []
+    amplitudes = []
+    positions = []
+    stop_reason = "tf"
+
+    print(f"[WORKER] - Streaming simulation, w={w}, k={k}")
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+
     try:
-        print(f"[WORKER] - Running simulation, w={w}, k={k}")
-        subprocess.run(command, check=True, capture_output=True, text=True)
-        print(f"[WORKER] - Simulation finished, w={w}, k={k}")
-    except subprocess.CalledProcessError as e:
+        for line in process.stdout:
+            try:
+                values = np.array(line.split(), dtype=np.float64)
+            except ValueError:
+                # Argument errors are printed to stdout
+                print(f"[WORKER] - {line.strip()}")
+                continue
+
+            time.append(values[0])
+            amplitudes.append(np.max(np.abs(values[1:])))
+            if record_positions:
+                positions.append(values[1:])
+                continue
+
+            modal.update(values[0], values[1:])
+
+            status = monitor.update(values[0], amplitudes[-1])
+            if status is not None:
+                stop_reason = status
+                process.terminate()
+                break
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    if stop_reason == "tf" and process.returncode != 0:
         print(f"[WORKER] - Error running simulation, w={w}, k={k}")
-        print(f"[WORKER] - {e.stderr}")
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    print(f"[WORKER] - Simulation finished ({stop_reason}), w={w}, k={k}")
+
+    static_data = build_static_data(m, k, A, l0, N, i, param)
+    time = np.array(time)
 
-    return unique_dir
+    if record_positions:
+        return build_animated_result(
+            static_data, time, np.array(positions).reshape((len(time), N - 1))
+        )
 
+    return {
+        "parameters": static_data,
+        "time": time,
+        "amplitudes": np.array(amplitudes),
+        "mode_energies": modal.result()["mode_energies"],
+        "k": static_data["K"],
+        "w": static_data["W"],
+        "stop_reason": stop_reason,
+    }
+
+
+# One scheduler.Job per simulation of the sweep, with (k, param) as parameters
+def sweep_jobs(k_params, N, stream=False):
+    return [
+        scheduler.Job(
+            (k, param), param["dt"], param["dt2"], param["tf"], N - 1, stream=stream
+        )
+        for k, params in k_params.items()
+        for param in params
+    ]
 
+
+# Runs the whole sweep with execute_simulation_stream, without touching disk
+def execute_simulations_stream(
+    m,
+    A,
+    l0,
+    N,
+    i,
+    k_params,
+    combinations_to_animate,
+    memory=None,
+    max_workers=None,
+    tolerance=STREAM_TOLERANCE,
+    divergence=STREAM_DIVERGENCE,
+    on_result=None,
+):
+
+    print("Executing simulations (streaming)")
+
+    def run(job):
+        k, param = job.parameters
+        return execute_simulation_stream(
+            k,
+            m,
+            A,
+            l0,
+            N,
+            param["w"],
+            i,
+            param["dt"],
+            param["dt2"],
+            param["tf"],
+            job.memory,
+            record_positions=(k, param["w"]) in combinations_to_animate,
+            tolerance=tolerance,
+            limit=divergence * A,
+        )
+
+    jobs = sweep_jobs(k_params, N, stream=True)
+    sweep_scheduler = scheduler.SweepScheduler(memory, max_workers)
+
+    completed = 0
+    results = []
+
+    for _, future in sweep_scheduler.run(jobs, run):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[MAIN] - Error running simulation: {e}")
+            continue
+
+        if on_result is not None:
+            on_result(result)
+
+        results.append(result)
+        completed += 1
+        print(f"[MAIN {completed}/{len(jobs)}] - Simulation streamed")
+
+    return results
+
+
+# Runs the whole sweep in-process with chain_engine instead of the jar
+def execute_simulations_numpy(m, A, l0, N, i, k_params, combinations_to_animate):
+
+    if i != "verlet":
+        raise ValueError(f"The numpy backend only implements verlet, got {i}")
+
+    print("Executing simulations (numpy backend)")
+
+    runs = [(k, param) for k, params in k_params.items() for param in params]
+
+    outputs = chain_engine.simulate_chain(
+        [k for k, _ in runs],
+        [param["w"] for _, param in runs],
+        m,
+        A,
+        N,
+        [param["dt"] for _, param in runs],
+        [param["dt2"] for _, param in runs],
+        [param["tf"] for _, param in runs],
+        record_positions=[
+            (k, param["w"]) in combinations_to_animate for k, param in runs
+        ],
+    )
+
+    results = []
+    for (k, param), output in zip(runs, outputs):
+        static_data = build_static_data(m, k, A, l0, N, i, param)
+
+        if "positions" in output:
+            result = build_animated_result(
+                static_data, output["time"], output["positions"]
+            )
+        else:
+            result = {
+                "parameters": static_data,
+                "time": output["time"],
+                "amplitudes": output["amplitudes"],
+                "k": static_data["K"],
+                "w": static_data["W"],
+            }
+
+        results.append(result)
+
+    return results
+
+
+# on_result, if given, is called with every result as soon as it is ready
 def execute_simulations(
     m,
     A,
@@ -72,99 +375,146 @@ def execute_simulations(
     i,
     k_params,
     combinations_to_animate,
-    simulation_dir="data/simulations",
-    memory=1500,
-    max_workers=4,
+    cache_dir=simulation_cache.DEFAULT_CACHE_DIR,
+    cache_max_bytes=simulation_cache.DEFAULT_CACHE_MAX_BYTES,
+    memory=None,
+    max_workers=None,
+    backend="jar",
+    on_result=None,
 ):
 
+    if backend == "numpy":
+        results = execute_simulations_numpy(
+            m, A, l0, N, i, k_params, combinations_to_animate
+        )
+        if on_result is not None:
+            for result in results:
+                on_result(result)
+        return results
+
+    if backend == "stream":
+        return execute_simulations_stream(
+            m,
+            A,
+            l0,
+            N,
+            i,
+            k_params,
+            combinations_to_animate,
+            memory,
+            max_workers,
+            on_result=on_result,
+        )
+
     print("Executing simulations")
 
-    dirs = []
+    cache = simulation_cache.SimulationCache(cache_dir, cache_max_bytes)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(
-                execute_simulation,
-                k,
-                m,
-                A,
-                l0,
-                N,
-                param["w"],
-                i,
-                param["dt"],
-                param["dt2"],
-                param["tf"],
-                f"{memory}m",
-                root_dir=simulation_dir,
+    # The whole sweep runs in one JVM, longest jobs first on a thread pool as
+    # big as max_workers (defaults to the cores) and memory (bytes, defaults to
+    # the available RAM) allow, with the heap sized from the jobs
+    jobs = sweep_jobs(k_params, N)
+    batch = scheduler.SweepScheduler(memory, max_workers).batch(jobs)
+
+    results = []
+
+    def collect(result):
+        if isinstance(result, Exception):
+            print(
+                f"[MAIN {len(results) + 1}/{len(jobs)}] - Error parsing results: {result}"
             )
-            for k, params in k_params.items()
-            for param in params
-        ]
+            return
 
-        jobs = len(futures)
-        completed = 0
+        if on_result is not None:
+            on_result(result)
 
-        results = []
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                dir = future.result()
-                dirs.append(dir)
-                print(f"[MAIN {completed + 1}/{jobs}] - Parsing results from {dir}")
+        results.append(result)
+        print(f"[MAIN {len(results)}/{len(jobs)}] - Results parsed")
 
-                static_file = os.path.join(dir, "static.txt")
-                dynamic_file = os.path.join(dir, "dynamic.txt")
+    with pipeline.AnalysisPipeline(analyze_simulation) as analysis:
+        # Parsing runs in the analysis pool while the remaining simulations run,
+        # and parsed results are handed over as every simulation finishes, so an
+        # interrupted sweep keeps them
+        for dir in execute_batch(m, A, l0, N, i, batch, cache):
+            if isinstance(dir, Exception):
+                print(f"[MAIN] - Error running simulation: {dir}")
+            else:
+                print(f"[MAIN] - Queued parsing of {dir}")
+                analysis.submit(dir, combinations_to_animate)
 
-                static_data = utils.parse_static_file_coupled(static_file)
-                time, positions = utils.parse_dynamic_file(dynamic_file)
+            for result in analysis.ready():
+                collect(result)
 
-                amplitudes = utils.calculate_amplitudes(positions)
+        for result in analysis.results():
+            collect(result)
 
-                # Convert to python lists
-                result = (
-                    {
-                        "parameters": static_data,
-                        "time": list(time),
-                        "amplitudes": list(amplitudes),
-                        "positions": [list(p) for p in positions],
-                        "k": static_data["K"],
-                        "w": static_data["W"],
-                    }
-                    if (static_data["K"], static_data["W"]) in combinations_to_animate
-                    else {
-                        "parameters": static_data,
-                        "time": list(time),
-                        "amplitudes": list(amplitudes),
-                        "k": static_data["K"],
-                        "w": static_data["W"],
-                    }
-                )
+    print("Pruning simulation cache")
+    cache.prune()
+
+    return results
 
-                results.append(result)
-                print(f"[MAIN {completed + 1}/{jobs}] - Results parsed from {dir}")
-                completed += 1
-            except Exception as e:
-                print(f"[MAIN {completed + 1}/{jobs}] - Error parsing results: {e}")
 
-    try:
-        print("Removing simulation directories")
-        shutil.rmtree(simulation_dir)
-    except Exception as e:
-        print(f"Error removing simulation directories: {e}")
+# Runs one adaptive_sweep.AdaptiveSweep per k. Every round the ws each sweep
+# asks for are simulated together in one execute_simulations batch, with
+# generate_params(k, ws) giving their simulation parameters. ws found in
+# completed, a dict of (k, w) -> max amplitude of runs from an earlier sweep,
+# are not simulated again.
+def execute_adaptive_sweep(sweeps, generate_params, completed=None, **kwargs):
+
+    completed = dict(completed or {})
+    results = []
+    sweep_round = 0
+
+    while not all(sweep.done() for sweep in sweeps.values()):
+        batches = {
+            k: sweep.next_batch() for k, sweep in sweeps.items() if not sweep.done()
+        }
+        k_params = {
+            k: generate_params(k, [w for w in ws if (k, w) not in completed])
+            for k, ws in batches.items()
+        }
+
+        sweep_round += 1
+        jobs = sum(len(params) for params in k_params.values())
+        print(f"Adaptive sweep round {sweep_round}, {jobs} simulations")
+
+        batch = execute_simulations(k_params=k_params, **kwargs) if jobs else []
+        results.extend(batch)
+
+        for result in batch:
+            amplitudes = result["amplitudes"]
+            completed[(result["k"], result["w"])] = (
+                np.max(amplitudes) if len(amplitudes) else 0
+            )
+
+        for k, ws in batches.items():
+            done = [w for w in ws if (k, w) in completed]
+            sweeps[k].update(done, [completed[(k, w)] for w in done])
 
     return results
 
 
-def plot_results(results, output_dir="data/"):
+# Figures are rendered by a render.FigureRenderer pool while the main process
+# goes through the results
+def plot_results(results, output_dir="data/", max_workers=None):
 
     print("Plotting results")
 
+    with render.FigureRenderer(max_workers) as renderer:
+        _plot_results(renderer, results, output_dir)
+
+    print("Results plotted")
+
+
+def _plot_results(renderer, results, output_dir):
+
     # dict of k -> (w, max_amplitude)
     max_amplitudes = {}
 
     # Create output directories
     os.makedirs(os.path.join(output_dir, "amplitudes_vs_time"), exist_ok=True)
     os.makedirs(os.path.join(output_dir, "amplitudes_vs_w"), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "mode_energies_vs_time"), exist_ok=True)
 
     for result in results:
         amplitudes = result["amplitudes"]
@@ -174,21 +524,40 @@ def plot_results(results, output_dir="data/"):
         text = f"k={k:.0f} kg/s$^2$\nw={w:.2f} rad/s"
 
         # Plot the amplitudes over time
-        plots.plot_amplitudes_vs_time(
-            result["time"],
-            amplitudes,
+        renderer.submit(
+            plots.AmplitudesVsTimeRenderer,
+            render.column(result, "time"),
+            render.column(result, "amplitudes"),
             text,
             os.path.join(
                 output_dir, "amplitudes_vs_time", f"amplitudes_vs_time_k-{k}_w-{w}.png"
             ),
         )
 
+        if "mode_energies" in result:
+            renderer.submit(
+                plots.plot_mode_energies_vs_time,
+                render.column(result, "time"),
+                render.column(result, "mode_energies"),
+                text,
+                os.path.join(
+                    output_dir,
+                    "mode_energies_vs_time",
+                    f"mode_energies_vs_time_k-{k}_w-{w}.png",
+                ),
+            )
+
         if k not in max_amplitudes:
-            theorical_resonance = utils.generate_frequencies(k, result["parameters"]["M"], result["parameters"]["N"], 1)[1]
-            max_amplitudes[k] = ([], theorical_resonance)
+            theorical_resonance = normal_modes.normal_frequencies(
+                k,
+                result["parameters"]["M"],
+                result["parameters"]["N"],
+                os.path.join(output_dir, "modes"),
+            )[:3]
+            max_amplitudes[k] = ([], theorical_resonance, result["parameters"])
 
         if len(amplitudes) > 0:
-            max_amplitudes[k][0].append((w, max(amplitudes)))
+            max_amplitudes[k][0].append((w, np.max(amplitudes)))
 
     resonances = []
 
@@ -200,150 +569,94 @@ def plot_results(results, output_dir="data/"):
             ws.append(w)
             amplitudes.append(amplitude)
 
-        peaks, _ = signal.find_peaks(amplitudes)
-
-        top_3_peaks = sorted(peaks, key=lambda x: amplitudes[x], reverse=True)[:3]
-        top_3_ws = [ws[i] for i in top_3_peaks]
-        w0 = min(top_3_ws)
-
-        resonances.append((k, w0))
+        # Lowest of the top 3 peaks, interpolated between the swept ws
+        w0 = fitting.resonance(ws, amplitudes, peaks=3, method="lorentzian")
+        if w0 is not None:
+            resonances.append((k, w0))
 
         text = f"k={k:.0f} kg/s$^2$"
 
-        plots.plot_amplitudes_vs_w(
+        parameters = data[2]
+        response_ws = np.linspace(min(ws), max(ws), RESPONSE_POINTS) if ws else []
+        response = (
+            response_ws,
+            frequency_response.amplitude_response(
+                response_ws, k, parameters["M"], parameters["N"], parameters["A"]
+            ),
+        )
+
+        renderer.submit(
+            plots.AmplitudesVsWRenderer,
             ws,
             data[1],
             amplitudes,
             text,
             os.path.join(output_dir, "amplitudes_vs_w", f"amplitudes_vs_w_k-{k}.png"),
+            response=response,
         )
 
     ks = [k for k, _ in sorted(resonances, key=lambda x: x[0])]
     ws = [w for _, w in sorted(resonances, key=lambda x: x[0])]
 
-    plots.plot_resonances_vs_k(
+    if not ks:
+        print("No resonance peaks found, skipping the w0 = C * sqrt(k) fit")
+        return
+
+    renderer.submit(
+        plots.plot_resonances_vs_k,
         ks,
         ws,
         os.path.join(output_dir, "resonances.png"),
     )
 
-    # Try to do regression (raiz)
-    constants = np.linspace(0.99, 1, num=100)
-    cuadratic_errors = []
-    for constant in constants:
-        cuadratic_error = 0
-        for k, w in zip(ks, ws):
-            cuadratic_error += (w - constant * np.sqrt(k)) ** 2
-
-        cuadratic_errors.append(cuadratic_error)
+    # Least squares fit of w0 = C * sqrt(k), with the errors plotted around it
+    best_constant = fitting.fit_sqrt_constant(ks, ws)
+    if len(ks) < 2:
+        print(f"C = {best_constant:.4f} (a single k, no confidence interval)")
+    else:
+        low, high = fitting.bootstrap_sqrt_constant(ks, ws)
+        print(f"C = {best_constant:.4f} (95% CI {low:.4f} - {high:.4f})")
 
-    best_constant = constants[cuadratic_errors.index(min(cuadratic_errors))]
+    constants = np.linspace(0.995, 1.005, num=101) * best_constant
+    cuadratic_errors = fitting.sqrt_fit_errors(ks, ws, constants)
 
-    plots.plot_resonance_with_best_constant_vs_k(
+    renderer.submit(
+        plots.plot_resonance_with_best_constant_vs_k,
         ks,
         ws,
         best_constant,
         os.path.join(output_dir, "resonance.png"),
     )
 
-    plots.plot_cuadratic_error_vs_constant(
+    renderer.submit(
+        plots.plot_cuadratic_error_vs_constant,
         constants,
         cuadratic_errors,
         os.path.join(output_dir, "cuadratic_error.png"),
     )
 
-    print("Results plotted")
-
-
-from matplotlib.animation import FuncAnimation, FFMpegWriter
-import matplotlib.pyplot as plt
-
-
-def animate(positions, l0, omega, dt, A, output_file="data/animation.mp4"):
-    # Convert positions to a NumPy array for easier indexing
-    positions = np.array(positions)
-
-    # Number of particles is the length of each snapshot
-    num_particles = positions.shape[1]
-
-    # Fixed x-coordinates based on L0 separation
-    x_coords = np.arange(num_particles) * l0
-
-    # Set up the figure and axis
-    fig, ax = plt.subplots()
-    ax.set_xlim(
-        -2 * l0, l0 * num_particles
-    )  # Fixed x-limits based on particle separation
-    min_y = min(positions.flatten())
-    max_y = max(positions.flatten())
-    extra = (max_y - min_y) / 5
-    ax.set_ylim(
-        min_y - extra, max_y + extra
-    )  # Dynamic y-limits based on particle movement
-        
-    ax.set_xticks([])
-    ax.set_yticks([])
-
-    # Initialize the scatter plot for particles
-    (particles,) = ax.plot([], [], "bo", ms=1)  # 'bo' means blue circles
-
-    # Line objects for connecting particles and the wall
-    (particle_lines,) = ax.plot([], [], "b-", lw=1)  # Lines between particles
-    (wall_line,) = ax.plot([], [], "b-", lw=1)
-    # Forced particle that follows the A * sin(ωt) function
-    # Initialize the particle at the leftmost particle's position
-    (forced_particle,) = ax.plot([-l0], [0], "go", ms=2)
-
-    frames = len(positions)
-
-    def update(frame):
-        # Print progress every 5% of frames, if frames is greater than 20
-        if frames > 20 and frame % (frames // 20) == 0:
-            print(f"Progress: {frame / frames * 100:.1f}%")
-
-        # Update particle positions
-        particles.set_data(x_coords, positions[frame])  # Fixed x, dynamic y
-
-        # Update lines between particles
-        particle_lines.set_data(x_coords, positions[frame])  # Connect particles
-
-        # Update line to the wall at y=0 from the rightmost particle
-        wall_line.set_data(
-            [x_coords[-1], x_coords[-1] + l0], [positions[frame][-1], 0]
-        )  # Rightmost particle to wall
-
-        # Update the forced particle
-        t = (frame + 1) * dt
-        forced_particle.set_data([-l0], [A * np.sin(omega * t)])
-
-        return particles, particle_lines, wall_line, forced_particle
-
-    # Number of frames equals the number of snapshots
-    frames = len(positions)
-
-    # Create the animation
-    ani = FuncAnimation(fig, update, frames=frames, interval=100, blit=True)
-
-    # Save the animation as an MP4 file
-    writer = FFMpegWriter(fps=10, metadata=dict(artist="Me"), bitrate=1800)
-    ani.save(output_file, writer=writer)
-
-    plt.close()  # Close the figure to avoid displaying it in interactive mode
-
 
 if __name__ == "__main__":
 
-    # First and only argument is directory
-    if len(sys.argv) != 2 and len(sys.argv) != 3 and len(sys.argv) != 4:
+    # Mode, then optional directory and flags
+    if len(sys.argv) < 2:
         print(
-            "Usage: python dampened_oscillator.py <generate|plot|animate> [directory] [ideal_ws]"
+            "Usage: python dampened_oscillator.py <generate|resume|plot|modal|animate> [directory] [ideal_ws] [numpy|stream] [adaptive] [stored] [start=T] [end=T] [frames=N|duration=S] [fps=N] [select=stride|envelope]"
         )
         sys.exit(1)
 
-    output_dir = sys.argv[2] if len(sys.argv) == 3 or len(sys.argv) == 4 else "data/"
-    ideal_ws = len(sys.argv) == 4 and sys.argv[3] == "ideal_ws"
-
-    if sys.argv[1] == "generate":
+    output_dir = sys.argv[2] if len(sys.argv) >= 3 else "data/"
+    flags = sys.argv[3:]
+    ideal_ws = "ideal_ws" in flags
+    backend = "jar"
+    if "numpy" in flags:
+        backend = "numpy"
+    elif "stream" in flags:
+        backend = "stream"
+    adaptive = "adaptive" in flags
+
+    if sys.argv[1] in ("generate", "resume"):
+        resume = sys.argv[1] == "resume"
         m = 0.001
         N = 100
         A = 0.01
@@ -367,7 +680,7 @@ if __name__ == "__main__":
 
         k_values = [100, 2000, 4000, 7000, 10000]
         frecuencies_resonances = [
-            utils.generate_frequencies(k, m, N, 50)
+            utils.generate_frequencies(k, m, N, 50, os.path.join(output_dir, "modes"))
             for k in [100, 2000, 4000, 7000, 10000]
         ]
         resonances = [frecuencies_resonances[i][1] for i in range(len(k_values))]
@@ -404,61 +717,193 @@ if __name__ == "__main__":
                     if param["w"] == w:
                         param["tf"] = 100
 
-        results = execute_simulations(
-                m=0.001,
-                A=0.01,
-                l0=0.001,
-                N=100,
-                i="verlet",
-                k_params=k_params,
-                combinations_to_animate=combinations_to_animate,
-                simulation_dir=os.path.join(output_dir, "simulations"),
-                memory=1524,
-                max_workers=8,
-            )
+        # Every run is journaled as soon as it is parsed; resume only runs the
+        # ones missing from the journal of an interrupted sweep
+        store = results_store.open_store(
+            os.path.join(output_dir, "results"), resume=resume
+        )
+        completed = {(run["k"], run["w"]) for run in store.runs()}
+        if resume:
+            print(f"Resuming, {len(completed)} runs already done")
+
+        simulation_options = {
+            "m": 0.001,
+            "A": 0.01,
+            "l0": 0.001,
+            "N": 100,
+            "i": "verlet",
+            "combinations_to_animate": combinations_to_animate,
+            "cache_dir": os.path.join(output_dir, "cache"),
+            "backend": backend,
+            "on_result": store.append_run,
+        }
+
+        if adaptive:
+            # Coarse grid plus the harmonics, refined around the peaks
+            w_ranges = [(5, 15), (40, 50), (55, 70), (75, 90), (90, 110)]
+            sweeps = {
+                k: adaptive_sweep.AdaptiveSweep(
+                    w_range[0],
+                    w_range[1],
+                    seeds=list(resonance)
+                    + [w for k_, w in combinations_to_animate if k_ == k],
+                )
+                for k, w_range, resonance in zip(k_values, w_ranges, resonances)
+            }
 
-        print("Saving results")
+            def generate_adaptive_params(k, ws):
+                params = generate_params(ws, resonances[k_values.index(k)])
+                for param in params:
+                    if (k, param["w"]) in combinations_to_animate:
+                        param["tf"] = 100
+                return params
+
+            execute_adaptive_sweep(
+                sweeps,
+                generate_adaptive_params,
+                completed={
+                    (run["k"], run["w"]): (
+                        np.max(run["amplitudes"]) if len(run["amplitudes"]) else 0
+                    )
+                    for run in store.runs()
+                },
+                **simulation_options,
+            )
+        else:
+            k_params = {
+                k: [param for param in params if (k, param["w"]) not in completed]
+                for k, params in k_params.items()
+            }
+            execute_simulations(k_params=k_params, **simulation_options)
 
-        with open(os.path.join(output_dir, "results.json"), "w") as f:
-            json.dump(results, f)
+        store.compact()
 
     elif sys.argv[1] == "plot":
         print("Loading results")
-        with open(os.path.join(output_dir, "results.json"), "r") as f:
-            results = json.load(f)
+        results = results_store.load_results(output_dir)
 
         plot_results(results, output_dir=output_dir)
+    elif sys.argv[1] == "modal":
+        m = 0.001
+        N = 100
+        A = 0.01
+        k_values = [100, 2000, 4000, 7000, 10000]
+
+        # One free run per k instead of a sweep of w; with stored, the runs
+        # with positions already in the results store are analysed instead
+        if "stored" in flags:
+            print("Loading results")
+            analyses = {
+                f"spectrum_k-{result['k']}_w-{result['w']}.png": modal.modal_analysis(
+                    result["k"],
+                    result["parameters"]["M"],
+                    result["parameters"]["N"],
+                    result["positions"],
+                    result["time"][1] - result["time"][0],
+                )
+                for result in results_store.load_results(output_dir)
+                if "positions" in result
+            }
+        else:
+            print("Simulating plucked runs")
+            analyses = {
+                f"spectrum_k-{analysis['k']}.png": analysis
+                for analysis in modal.pluck_modes(k_values, m, A, N)
+            }
+
+        os.makedirs(os.path.join(output_dir, "modal"), exist_ok=True)
+
+        with render.FigureRenderer() as renderer:
+            for file_name, analysis in analyses.items():
+                k = analysis["k"]
+                print(f"k={k:.0f}")
+                for frequency, harmonic in zip(
+                    analysis["frequencies"], analysis["harmonics"]
+                ):
+                    print(
+                        f"  w={frequency:.4f} rad/s, theoretical {harmonic:.4f} rad/s"
+                        f" ({(frequency - harmonic) / harmonic:+.2e})"
+                    )
+
+                omegas, amplitudes = analysis["spectrum"]
+                renderer.submit(
+                    plots.plot_modal_spectrum,
+                    omegas,
+                    amplitudes,
+                    analysis["frequencies"],
+                    analysis["harmonics"],
+                    os.path.join(output_dir, "modal", file_name),
+                )
     elif sys.argv[1] == "animate":
         print("Loading results")
-        with open(os.path.join(output_dir, "results.json"), "r") as f:
-            results = json.load(f)
+        results = results_store.load_results(output_dir)
 
-        animated = False
         os.makedirs(os.path.join(output_dir, "animations"), exist_ok=True)
 
+        # key=value flags pick the frames: a start/end time window, a frame
+        # count (or a duration in seconds at fps) and select=stride|envelope
+        options = dict(flag.split("=", 1) for flag in flags if "=" in flag)
+        start = float(options["start"]) if "start" in options else None
+        end = float(options["end"]) if "end" in options else None
+        fps = int(options.get("fps", 10))
+        frames = int(options["frames"]) if "frames" in options else None
+        if "duration" in options:
+            frames = round(float(options["duration"]) * fps)
+        method = options.get("select", "stride")
+
+        # Every animation is split into segments rendered in parallel
+        animations = []
         for result in results:
-            if "positions" in result:
-                print(f"Animating k={result['k']} w={result['w']}")
-                animate(
-                    result["positions"],
-                    result["parameters"]["L0"],
-                    result["parameters"]["W"],
-                    result["parameters"]["Dt2"],
-                    result["parameters"]["A"],
-                    output_file=os.path.join(
+            if "positions" not in result:
+                continue
+
+            time = np.asarray(result["time"])
+            try:
+                rows = animation.select_frames(
+                    time, result["amplitudes"], start, end, frames, method
+                )
+            except ValueError as e:
+                print(f"Skipping k={result['k']}, w={result['w']}: {e}")
+                continue
+
+            animations.append(
+                {
+                    "positions": render.column(result, "positions"),
+                    "rows": rows,
+                    "times": time[rows],
+                    "fps": fps,
+                    "l0": result["parameters"]["L0"],
+                    "omega": result["parameters"]["W"],
+                    "dt": result["parameters"]["Dt2"],
+                    "A": result["parameters"]["A"],
+                    "output_file": os.path.join(
                         output_dir,
                         "animations",
                         f"animation_{result['k']}_{result['w']}.mp4",
                     ),
-                )
-                animated = True
+                }
+            )
+        animated = len(animations) > 0
+
+        for job in animations:
+            print(f"Animating {job['output_file']}")
+
+        # numpy draws the frames with animation.rasterize instead of matplotlib
+        failed = animation.animate_all(
+            animations,
+            renderer=animation.rasterize if backend == "numpy" else animation.animate,
+        )
 
         if not animated:
             print("No results with positions found")
             sys.exit(1)
 
+        if failed > 0:
+            print(f"{failed} of {len(animations)} animations failed")
+            sys.exit(1)
+
     else:
         print(
-            "Usage: python dampened_oscillator.py <generate|plot> [directory] [ideal_ws]"
+            "Usage: python dampened_oscillator.py <generate|resume|plot|modal|animate> [directory] [ideal_ws] [numpy|stream] [adaptive] [stored] [start=T] [end=T] [frames=N|duration=S] [fps=N] [select=stride|envelope]"
         )
         sys.exit(1)
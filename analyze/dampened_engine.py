@@ -0,0 +1,235 @@
+import numpy as np
+import utils
+
+# In-process version of dampened/App.java. Every integrator step is linear in
+# its state, so one step is written as a matrix per dt and the runs are advanced
+# snapshot to snapshot by powers of that matrix, vectorized across all dts.
+#
+# For dt down to 1e-6 a step barely changes the state, so a matrix 1 + tiny
+# would lose the tiny part to rounding. Instead each step function below
+# returns the increment of the state (the same arithmetic as the Java
+# integrators, rearranged), previous values are tracked as differences
+# (current - previous), and powers are taken as I + E keeping E separately.
+# States have the state variables on the first axis.
+
+
+def _force(r, v, k, gamma):
+    return -k * r - gamma * v
+
+
+# State: r(t), d = r(t) - r(t-dt), v(t)
+def _verlet_initial(r0, v0, dt, m, k, gamma):
+    force = _force(r0, v0, k, gamma)
+    return np.stack([r0, v0 * dt - (dt * dt / (2 * m)) * force, v0])
+
+
+def _verlet_increment(state, dt, m, k, gamma):
+    r, d, v = state
+    force = _force(r, v, k, gamma)
+
+    # r(t+dt) - r(t) = r(t) - r(t-dt) + (dt^2 / m) * f(t)
+    step = d + (dt**2 / m) * force
+
+    # v(t+dt) = (r(t+dt) - r(t)) / dt
+    return np.stack([step, step - d, step / dt - v])
+
+
+# State: r(t), v(t), d = r(t) - r(t-dt), e = v(t) - v(t-dt)
+def _beeman_initial(r0, v0, dt, m, k, gamma):
+    force = _force(r0, v0, k, gamma)
+    d = v0 * dt - (dt * dt / (2 * m)) * force
+    e = (dt / m) * force
+    return np.stack([r0, v0, d, e])
+
+
+def _beeman_increment(state, dt, m, k, gamma):
+    r, v, d, e = state
+
+    a = _force(r, v, k, gamma) / m
+    previous_a = a - _force(d, e, k, gamma) / m
+
+    step_r = v * dt + (2.0 / 3.0) * a * dt**2 - (1.0 / 6.0) * previous_a * dt**2
+    predicted_v = v + (3.0 / 2.0) * a * dt - (1.0 / 2.0) * previous_a * dt
+
+    next_a = _force(r + step_r, predicted_v, k, gamma) / m
+    step_v = (
+        (1.0 / 3.0) * next_a * dt + (5.0 / 6.0) * a * dt - (1.0 / 6.0) * previous_a * dt
+    )
+
+    return np.stack([step_r, step_v, step_r - d, step_v - e])
+
+
+# State: r, r1, r2, r3, r4, r5
+def _gear_initial(r0, v0, dt, m, k, gamma):
+    derivatives = [r0, v0]
+    for _ in range(4):
+        derivatives.append((-k * derivatives[-2] - gamma * derivatives[-1]) / m)
+    return np.stack(derivatives)
+
+
+def _gear_increment(state, dt, m, k, gamma):
+    r, r1, r2, r3, r4, r5 = state
+
+    # Predict
+    p5 = 0 * r5
+    p4 = r5 * dt
+    p3 = r4 * dt + r5 * (dt**2 / 2)
+    p2 = r3 * dt + r4 * (dt**2 / 2) + r5 * (dt**3 / (3 * 2))
+    p1 = (
+        r2 * dt + r3 * (dt**2 / 2) + r4 * (dt**3 / (3 * 2)) + r5 * (dt**4 / (4 * 3 * 2))
+    )
+    p0 = (
+        r1 * dt
+        + r2 * (dt**2 / 2)
+        + r3 * (dt**3 / (3 * 2))
+        + r4 * (dt**4 / (4 * 3 * 2))
+        + r5 * (dt**5 / (5 * 4 * 3 * 2))
+    )
+
+    # Correct
+    da = _force(r + p0, r1 + p1, k, gamma) / m - (r2 + p2)
+    dr2 = da * dt**2 / 2
+
+    return np.stack(
+        [
+            p0 + (3.0 / 16.0) * dr2,
+            p1 + (251.0 / 360.0) * dr2 * (1 / dt),
+            p2 + dr2 * (2 / dt**2),
+            p3 + (11.0 / 18.0) * dr2 * ((3 * 2) / dt**3),
+            p4 + (1.0 / 6.0) * dr2 * ((4 * 3 * 2) / dt**4),
+            p5 + (1.0 / 60.0) * dr2 * ((5 * 4 * 3 * 2) / dt**5),
+        ]
+    )
+
+
+# Scale of each state variable, chosen so they are all about the size of a
+# position (w0 = sqrt(k / m)); keeps the step matrices well conditioned
+def _verlet_scales(dt, w0):
+    return np.array([1, w0 * dt, w0])
+
+
+def _beeman_scales(dt, w0):
+    return np.array([1, w0, w0 * dt, w0**2 * dt])
+
+
+def _gear_scales(dt, w0):
+    return w0 ** np.arange(6.0)
+
+
+INTEGRATORS = {
+    "verlet": (_verlet_initial, _verlet_increment, _verlet_scales),
+    "beeman": (_beeman_initial, _beeman_increment, _beeman_scales),
+    "gear": (_gear_initial, _gear_increment, _gear_scales),
+}
+
+
+# (I + a)(I + b) = I + (a + b + ab)
+def _compose(a, b):
+    return a + b + a @ b
+
+
+# E such that (I + increments)^power = I + E, by binary exponentiation
+def _power(increments, power):
+    result = np.zeros_like(increments)
+    while power > 0:
+        if power & 1:
+            result = _compose(result, increments)
+        increments = _compose(increments, increments)
+        power >>= 1
+    return result
+
+
+def analytic_solution(t, r0, m, k, gamma):
+    return (
+        r0
+        * np.exp(-gamma * t / (2 * m))
+        * np.cos(np.sqrt(k / m - (gamma / (2 * m)) ** 2) * t)
+    )
+
+
+# Positions at every snapshot of one integrator for all dts. schedules holds
+# (iterations, period) from utils.simulation_schedule for each dt.
+def _integrate(integrator, dts, schedules, r0, v0, m, k, gamma):
+    initial, increment, scale = INTEGRATORS[integrator]
+
+    dts = np.asarray(dts, dtype=np.float64)
+    scales = np.stack([scale(dt, np.sqrt(k / m)) for dt in dts])
+    size = scales.shape[1]
+
+    # Increment of one step as a matrix per dt: E[d, i, j] = increment(e_j)[i],
+    # in the scaled variables
+    identity = np.broadcast_to(np.eye(size)[:, None, :], (size, len(dts), size))
+    increments = np.moveaxis(increment(identity, dts[:, None], m, k, gamma), 0, 1)
+    increments = increments * scales[:, None, :] / scales[:, :, None]
+
+    counts = [
+        (iterations - 1) // period if period else 0 for iterations, period in schedules
+    ]
+    first = np.empty_like(increments)
+    between = np.empty_like(increments)
+    for d, (_, period) in enumerate(schedules):
+        period = period or 1
+        between[d] = _power(increments[d], period)
+        first[d] = _compose(between[d], increments[d])
+
+    state = np.stack([initial(r0, v0, dt, m, k, gamma) for dt in dts]) / scales
+    state = state + np.einsum("dij,dj->di", first, state)
+
+    positions = np.empty((len(dts), max(counts, default=0)))
+    for snapshot in range(positions.shape[1]):
+        positions[:, snapshot] = state[:, 0]
+        state = state + np.einsum("dij,dj->di", between, state)
+
+    return [positions[d, :count] for d, count in enumerate(counts)]
+
+
+def _analytic(dts, dt2s, tf, r0, m, k, gamma):
+    # Same accumulated time as AnaliticSolution
+    return [
+        analytic_solution(utils.snapshot_times(dt, dt2, tf), r0, m, k, gamma)
+        for dt, dt2 in zip(dts, dt2s)
+    ]
+
+
+# Same results structure as dampened_oscillator.execute_simulations, without
+# launching the jar. dt2s defaults to the snapshot step the driver uses.
+def simulate_dampened(gamma, k, m, A, integrators, dts, tf, dt2s=None):
+    dts = [float(dt) for dt in dts]
+    if dt2s is None:
+        dt2s = [0.01 if dt <= 0.01 else dt for dt in dts]
+
+    schedules = [utils.simulation_schedule(dt, dt2, tf) for dt, dt2 in zip(dts, dt2s)]
+
+    r0 = float(A)
+    v0 = -r0 * (gamma / (2 * m))
+
+    results = []
+    for integrator in integrators:
+        if integrator == "analitic":
+            positions = _analytic(dts, dt2s, tf, r0, m, k, gamma)
+        else:
+            positions = _integrate(integrator, dts, schedules, r0, v0, m, k, gamma)
+
+        for dt, dt2, run_positions in zip(dts, dt2s, positions):
+            static_data = {
+                "M": float(m),
+                "K": float(k),
+                "Gamma": float(gamma),
+                "R0": r0,
+                "Dt": dt,
+                "Dt2": float(dt2),
+                "Tf": float(tf),
+                "Integrator": integrator,
+            }
+
+            results.append(
+                {
+                    "parameters": static_data,
+                    "time": list((np.arange(len(run_positions)) + 1) * dt2),
+                    "positions": list(run_positions),
+                    "integrator": integrator,
+                    "dt": dt,
+                }
+            )
+
+    return results
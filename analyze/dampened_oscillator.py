@@ -1,56 +1,77 @@
 import os
-import shutil
 import subprocess
-import concurrent.futures
 import numpy as np
 import utils
-import json
 import plots
+import render
+import simulation_cache
+import results_store
+import scheduler
+import dampened_engine
+import pipeline
+import error_engine
 import sys
 
-
-def execute_simulation(gamma, k, m, A, i, dt, dt2, tf, root_dir="data/simulations"):
-
-    name = f"dt-{dt}_i-{i}-d"
-    unique_dir = os.path.join(root_dir, name)
-
-    os.makedirs(unique_dir, exist_ok=True)
-
-    command = [
-        "java",
-        "-jar",
-        "target/dampened-oscillator-jar-with-dependencies.jar",
-        "-out",
-        unique_dir,
-        "-g",
-        str(gamma),
-        "-k",
-        str(k),
-        "-m",
-        str(m),
-        "-r0",
-        str(A),
-        "-i",
-        i,
-        "-dt",
-        str(dt),
-        "-dt2",
-        str(dt2),
-        "-tf",
-        str(tf),
+JAR = "target/dampened-oscillator-jar-with-dependencies.jar"
+
+
+# Runs a scheduler.Batch in a single JVM. Yields the directory, or the error,
+# of each of its simulations as soon as it finishes.
+def execute_batch(gamma, k, m, A, tf, batch, cache):
+
+    parameters_list = [
+        {
+            "g": gamma,
+            "k": k,
+            "m": m,
+            "r0": A,
+            "i": i,
+            "dt": dt,
+            "dt2": dt2,
+            "tf": tf,
+        }
+        for i, dt, dt2 in batch.parameters
     ]
 
-    try:
-        print(f"Running simulation, i={i}, dt={dt}")
-        subprocess.run(command, check=True, capture_output=True, text=True)
-        print(f"Simulation finished, i={i}, dt={dt}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running simulation, i={i}, dt={dt}")
-        print(f"Error: {e.stderr}")
+    print(f"Running {len(parameters_list)} simulations, {batch.threads} at once")
+    for index, dir in cache.execute_batch(
+        JAR,
+        parameters_list,
+        java_options=[f"-Xms{batch.memory}", f"-Xmx{batch.memory}"],
+        threads=batch.threads,
+    ):
+        parameters = parameters_list[index]
+
+        if isinstance(dir, subprocess.CalledProcessError):
+            print(
+                f"Error running simulation, i={parameters['i']}, dt={parameters['dt']}"
+            )
+            print(f"Error: {dir.stderr}")
+        else:
+            print(f"Simulation finished, i={parameters['i']}, dt={parameters['dt']}")
+
+        yield dir
+
+
+# Parses one simulation directory. Runs in the analysis pool.
+def analyze_simulation(dir):
+    static_file = os.path.join(dir, "static.txt")
+    dynamic_file = os.path.join(dir, "dynamic.txt")
 
-    return unique_dir
+    static_data = utils.parse_static_file_dampened(static_file)
+    time, positions = utils.parse_dynamic_file(dynamic_file, max_workers=1)
 
+    return {
+        "parameters": static_data,
+        "time": np.array(time),
+        "positions": np.array(positions[:, 0]),
+        "integrator": static_data["Integrator"],
+        "dt": static_data["Dt"],
+    }
 
+
+# Runs every (integrator, dt) not in completed. on_result, if given, is called
+# with every result as soon as it is ready.
 def execute_simulations(
     gamma,
     k,
@@ -59,190 +80,215 @@ def execute_simulations(
     integrators,
     dts,
     tf,
-    simulation_dir="data/simulations",
-    max_workers=4,
+    cache_dir=simulation_cache.DEFAULT_CACHE_DIR,
+    cache_max_bytes=simulation_cache.DEFAULT_CACHE_MAX_BYTES,
+    memory=None,
+    max_workers=None,
+    backend="jar",
+    completed=(),
+    on_result=None,
 ):
 
-    print("Executing simulations")
-
-    dirs = []
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(
-                execute_simulation,
-                gamma,
-                k,
-                m,
-                A,
-                i,
-                dt,
-                0.01 if dt <= 0.01 else dt,
-                tf,
-                root_dir=simulation_dir,
+    if backend == "numpy":
+        print("Executing simulations (numpy backend)")
+        results = [
+            result
+            for result in dampened_engine.simulate_dampened(
+                gamma, k, m, A, integrators, dts, tf
             )
-            for i in integrators
-            for dt in dts
+            if (result["integrator"], result["dt"]) not in completed
         ]
 
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                dir = future.result()
-                dirs.append(dir)
-            except Exception as e:
-                print(f"Error: {e}")
+        if on_result is not None:
+            for result in results:
+                on_result(result)
+
+        return results
+
+    print("Executing simulations")
+
+    cache = simulation_cache.SimulationCache(cache_dir, cache_max_bytes)
+
+    jobs = []
+    for i in integrators:
+        for dt in dts:
+            if (i, dt) in completed:
+                continue
+
+            dt2 = 0.01 if dt <= 0.01 else dt
+            jobs.append(scheduler.Job((i, dt, dt2), dt, dt2, tf, 1))
+
+    # The whole sweep runs in one JVM, on a thread pool as big as the cores and
+    # memory allow. The dt=1e-6 runs dominate it and start first.
+    batch = scheduler.SweepScheduler(memory, max_workers).batch(jobs)
 
     results = []
 
-    for dir in dirs:
+    def collect(result):
+        if isinstance(result, Exception):
+            print(f"Error: {result}")
+            return
 
-        try:
-            print(f"Parsing results from {dir}")
+        if on_result is not None:
+            on_result(result)
 
-            static_file = os.path.join(dir, "static.txt")
-            dynamic_file = os.path.join(dir, "dynamic.txt")
+        results.append(result)
 
-            static_data = utils.parse_static_file_dampened(static_file)
-            time, positions = utils.parse_dynamic_file(dynamic_file)
+        print(f"Results parsed for i={result['integrator']}, dt={result['dt']}")
 
-            # Convert to python lists
-            results.append(
-                {
-                    "parameters": static_data,
-                    "time": list(time),
-                    "positions": list(positions[:, 0]),
-                    "integrator": static_data["Integrator"],
-                    "dt": static_data["Dt"],
-                }
-            )
+    with pipeline.AnalysisPipeline(analyze_simulation) as analysis:
+        # Parsing runs in the analysis pool while the remaining simulations run,
+        # and parsed results are handed over as every simulation finishes, so an
+        # interrupted sweep keeps them
+        for dir in execute_batch(gamma, k, m, A, tf, batch, cache):
+            if isinstance(dir, Exception):
+                print(f"Error: {dir}")
+            else:
+                print(f"Parsing results from {dir}")
+                analysis.submit(dir)
+
+            for result in analysis.ready():
+                collect(result)
 
-            print(f"Results parsed from {dir}")
-        except Exception as e:
-            print(f"Error: {e}")
+        for result in analysis.results():
+            collect(result)
 
-    try:
-        print("Cleaning up")
-        shutil.rmtree(simulation_dir)
-    except Exception as e:
-        print(f"Error: {e}")
+    print("Pruning simulation cache")
+    cache.prune()
 
     return results
 
 
-def plot_results(results, output_dir="data/"):
+# Figures are rendered by a render.FigureRenderer pool
+def plot_results(results, output_dir="data/", max_workers=None):
 
     print("Plotting results")
 
+    with render.FigureRenderer(max_workers) as renderer:
+        _plot_results(renderer, results, output_dir)
+
+    print("Results plotted")
+
+
+def _plot_results(renderer, results, output_dir):
+
     all_positions = []
     all_times = []
     all_squared_errors = []
     labels = []
+    parameters = None
 
-    # Dict of dt -> analitic_positions (positions for analitic integrator)
-    analitic_positions = {}
-    analitic_times = {}
-    dts = set()
-    for result in results:
-        positions = result["positions"]
-        integrator = result["integrator"]
-        dt = result["dt"]
-
-        dts.add(dt)
-
-        if integrator == "analitic":
-            analitic_positions[dt] = positions
-            analitic_times[dt] = result["time"]
+    # The reference is evaluated by error_engine, analytic runs (left by older
+    # sweeps) are not needed
+    runs = [result for result in results if result["integrator"] != "analitic"]
 
     # Nearest dt to 0.01, used for plots vs time
-    selected_dt = min(dts, key=lambda x: abs(x - 0.01))
-    analitic_pos_for_selected_dt = analitic_positions[selected_dt]
-    analitic_times_for_selected_dt = analitic_times[selected_dt]
+    selected_dt = min({run["dt"] for run in runs}, key=lambda x: abs(x - 0.01))
+
+    # Every run is compared in parallel, streaming its positions
+    errors = error_engine.compare_runs(
+        [
+            {
+                "positions": render.column(run, "positions"),
+                "parameters": run["parameters"],
+                "keep": run["dt"] == selected_dt,
+            }
+            for run in runs
+        ]
+    )
 
     # Dict of integrator -> (dt, squared_error)
     mean_squared_errors = {}
 
-    for result in results:
-
-        if result["integrator"] == "analitic":
-            continue
-
-        time = result["time"]
-        positions = result["positions"]
-        integrator = result["integrator"]
-        dt = result["dt"]
-
-        squared_error = np.square(
-            np.array(positions) - np.array(analitic_positions[dt])
-        )
-        mean_squared_error = np.mean(squared_error)
+    for run, error in zip(runs, errors):
+        integrator = run["integrator"]
+        dt = run["dt"]
 
         if integrator not in mean_squared_errors:
             mean_squared_errors[integrator] = []
 
-        mean_squared_errors[integrator].append((dt, mean_squared_error))
+        mean_squared_errors[integrator].append((dt, error["mean_squared_error"]))
 
         if dt != selected_dt:
             continue
 
-        all_squared_errors.append(squared_error)
-        all_positions.append(positions)
-        all_times.append(time)
+        all_squared_errors.append(error["squared_error"])
+        all_positions.append(run["positions"][: len(error["time"])])
+        all_times.append(error["time"])
         labels.append(integrator)
+        parameters = run["parameters"]
+
+    analitic_times = all_times[0]
+    analitic_positions = error_engine.dampened_reference(analitic_times, parameters)
 
-    plots.plot_positions_vs_time(
-        all_times + [analitic_times_for_selected_dt],
-        all_positions + [analitic_pos_for_selected_dt],
+    renderer.submit(
+        plots.plot_positions_vs_time,
+        all_times + [analitic_times],
+        all_positions + [analitic_positions],
         labels + ["analitic"],
         file_name=f"{output_dir}/positions_vs_time.png",
     )
 
-    plots.plot_squared_error_vs_time(
+    renderer.submit(
+        plots.plot_squared_error_vs_time,
         all_times,
         all_squared_errors,
         labels,
         file_name=f"{output_dir}/squared_error_vs_time.png",
     )
 
-    plots.plot_mean_squared_error_vs_dt(
+    renderer.submit(
+        plots.plot_mean_squared_error_vs_dt,
         mean_squared_errors,
         file_name=f"{output_dir}/mean_squared_error_vs_dt.png",
     )
 
-    print("Results plotted")
-
 
 if __name__ == "__main__":
 
-    # First and only argument is directory
-    if len(sys.argv) != 2 and len(sys.argv) != 3:
-        print("Usage: python dampened_oscillator.py <generate|plot> [directory]")
+    # Mode, then optional directory and flags
+    if len(sys.argv) < 2:
+        print(
+            "Usage: python dampened_oscillator.py <generate|resume|plot> [directory] [numpy]"
+        )
         sys.exit(1)
 
-    output_dir = sys.argv[2] if len(sys.argv) == 3 else "data/"
+    output_dir = sys.argv[2] if len(sys.argv) >= 3 else "data/"
+    flags = sys.argv[3:]
+    backend = "numpy" if "numpy" in flags else "jar"
+
+    if sys.argv[1] in ("generate", "resume"):
+        # Every run is journaled as soon as it is parsed; resume only runs the
+        # ones missing from the journal of an interrupted sweep
+        store = results_store.open_store(
+            os.path.join(output_dir, "results"), resume=sys.argv[1] == "resume"
+        )
+        completed = {(run["integrator"], run["dt"]) for run in store.runs()}
 
-    if sys.argv[1] == "generate":
-        results = execute_simulations(
+        execute_simulations(
             gamma=100,
             k=10000,
             m=170,
             A=1,
-            integrators=["beeman", "gear", "verlet", "analitic"],
+            integrators=["beeman", "gear", "verlet"],
             dts=list(np.logspace(-6, -1, num=50)),
             # dts=[1e-6],
             tf=5,
-            simulation_dir=os.path.join(output_dir, "simulations"),
-            max_workers=5,
+            cache_dir=os.path.join(output_dir, "cache"),
+            backend=backend,
+            completed=completed,
+            on_result=store.append_run,
         )
 
-        with open(os.path.join(output_dir, "results.json"), "w") as f:
-            json.dump(results, f)
+        store.compact()
 
     elif sys.argv[1] == "plot":
-        with open(os.path.join(output_dir, "results.json"), "r") as f:
-            results = json.load(f)
+        results = results_store.load_results(output_dir)
 
         plot_results(results, output_dir=output_dir)
 
     else:
-        print("Usage: python dampened_oscillator.py <generate|plot>")
+        print(
+            "Usage: python dampened_oscillator.py <generate|resume|plot> [directory] [numpy]"
+        )
         sys.exit(1)
@@ -0,0 +1,130 @@
+import os
+import concurrent.futures
+import numpy as np
+import utils
+import render
+import dampened_engine
+
+# Snapshots compared per block, and length (s) of the windows the error is also
+# reported over
+BLOCK_SIZE = 65536
+DEFAULT_WINDOW = 0.5
+
+
+# One-pass error statistics of a run against a reference: mean squared error,
+# max absolute error and mean squared error per window of window seconds. The
+# squared errors of a block are summed pairwise by NumPy and the block sums are
+# added with Kahan compensation, so long runs do not lose the small errors of
+# fine dts. keep also keeps the squared error of every snapshot.
+class ErrorAccumulator:
+    def __init__(self, window=DEFAULT_WINDOW, keep=False):
+        self.window = window
+        self.keep = keep
+        self.count = 0
+        self.total = 0.0
+        self.compensation = 0.0
+        self.max_error = 0.0
+        self.window_totals = np.zeros(0)
+        self.window_counts = np.zeros(0, dtype=np.int64)
+        self.times = []
+        self.squared_errors = []
+
+    def update(self, times, errors):
+        times = np.asarray(times, dtype=np.float64)
+        errors = np.asarray(errors, dtype=np.float64)
+
+        if len(errors) == 0:
+            return
+
+        squared_errors = np.square(errors)
+
+        # Kahan sum of the block sums
+        corrected = np.sum(squared_errors) - self.compensation
+        total = self.total + corrected
+        self.compensation = (total - self.total) - corrected
+        self.total = total
+
+        self.count += len(errors)
+        self.max_error = max(self.max_error, np.max(np.abs(errors)))
+
+        windows = (times // self.window).astype(np.int64)
+        size = max(len(self.window_totals), windows[-1] + 1)
+        self.window_totals = np.pad(
+            self.window_totals, (0, size - len(self.window_totals))
+        )
+        self.window_counts = np.pad(
+            self.window_counts, (0, size - len(self.window_counts))
+        )
+        self.window_totals += np.bincount(
+            windows, weights=squared_errors, minlength=size
+        )
+        self.window_counts += np.bincount(windows, minlength=size)
+
+        if self.keep:
+            self.times.append(times)
+            self.squared_errors.append(squared_errors)
+
+    def result(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            window_errors = self.window_totals / self.window_counts
+
+        result = {
+            "mean_squared_error": self.total / self.count if self.count else np.nan,
+            "max_error": self.max_error,
+            "window_times": np.arange(len(self.window_totals)) * self.window,
+            "window_errors": window_errors,
+        }
+
+        if self.keep:
+            result["time"] = np.concatenate(self.times) if self.times else np.empty(0)
+            result["squared_error"] = (
+                np.concatenate(self.squared_errors)
+                if self.squared_errors
+                else np.empty(0)
+            )
+
+        return result
+
+
+# Analytic solution of the dampened oscillator of a run, at the given times
+def dampened_reference(times, parameters):
+    return dampened_engine.analytic_solution(
+        times,
+        parameters["R0"],
+        parameters["M"],
+        parameters["K"],
+        parameters["Gamma"],
+    )
+
+
+# Errors of one run. positions may be a render.column reference, memory-mapped
+# and read block by block; the reference is evaluated at the times the
+# integrator actually reached (utils.snapshot_times), one block at a time.
+def run_errors(
+    positions,
+    parameters,
+    reference=dampened_reference,
+    window=DEFAULT_WINDOW,
+    keep=False,
+):
+    positions = render.resolve(positions)
+    times = utils.snapshot_times(parameters["Dt"], parameters["Dt2"], parameters["Tf"])
+
+    accumulator = ErrorAccumulator(window, keep)
+
+    for start in range(0, min(len(positions), len(times)), BLOCK_SIZE):
+        block_times = times[start : start + BLOCK_SIZE]
+        block = np.asarray(positions[start : start + BLOCK_SIZE], dtype=np.float64)
+        accumulator.update(block_times, block - reference(block_times, parameters))
+
+    return accumulator.result()
+
+
+# run_errors for many runs at once in a process pool. runs holds dicts with the
+# keyword arguments of run_errors; returns the results in the same order.
+def compare_runs(runs, max_workers=None):
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_errors, **run) for run in runs]
+        return [future.result() for future in futures]
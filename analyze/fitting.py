@@ -0,0 +1,121 @@
+import numpy as np
+from scipy import signal
+
+# Resampling used for the confidence interval of the sqrt(k) fit
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+
+
+# Vertex of the parabola through (x[i - 1], y[i - 1]), (x[i], y[i]) and
+# (x[i + 1], y[i + 1]) for every index i, on a possibly uneven grid. Returns the
+# vertices and the curvature of each parabola.
+def _vertices(x, y, indices):
+    x0, x1, x2 = x[indices - 1], x[indices], x[indices + 1]
+    y0, y1, y2 = y[indices - 1], y[indices], y[indices + 1]
+
+    denominator = (x0 - x1) * (x0 - x2) * (x1 - x2)
+    a = (x2 * (y1 - y0) + x1 * (y0 - y2) + x0 * (y2 - y1)) / denominator
+    b = (x2**2 * (y0 - y1) + x1**2 * (y2 - y0) + x0**2 * (y1 - y2)) / denominator
+    c = y1 - a * x1**2 - b * x1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vertices = -b / (2 * a)
+
+    # Keep the vertex between the neighbours of the peak
+    vertices = np.clip(vertices, x0, x2)
+
+    return vertices, a * vertices**2 + b * vertices + c, a
+
+
+# Sub-grid position and height of the peaks of amplitudes(ws) at indices, from
+# the three samples around each one. "parabolic" fits the amplitudes
+# themselves, "lorentzian" fits 1 / amplitude^2, which is exactly a parabola
+# for a Lorentzian power response. Peaks at the edges, or whose fit has no
+# maximum, keep their grid values.
+def refine_peaks(ws, amplitudes, indices, method="parabolic"):
+    ws = np.asarray(ws, dtype=np.float64)
+    amplitudes = np.asarray(amplitudes, dtype=np.float64)
+    indices = np.asarray(indices, dtype=int)
+
+    peak_ws = ws[indices]
+    peak_amplitudes = amplitudes[indices]
+
+    inner = (indices > 0) & (indices < len(ws) - 1)
+    if not np.any(inner):
+        return peak_ws, peak_amplitudes
+
+    if method == "parabolic":
+        vertices, heights, curvatures = _vertices(ws, amplitudes, indices[inner])
+        valid = curvatures < 0
+    elif method == "lorentzian":
+        with np.errstate(divide="ignore"):
+            inverse = 1 / np.square(amplitudes)
+        vertices, heights, curvatures = _vertices(ws, inverse, indices[inner])
+        valid = curvatures > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            heights = np.where(
+                heights > 0, 1 / np.sqrt(heights), amplitudes[indices[inner]]
+            )
+    else:
+        raise ValueError(f"Unknown peak fit: {method}")
+
+    valid &= np.isfinite(vertices) & np.isfinite(heights)
+
+    positions = np.nonzero(inner)[0][valid]
+    peak_ws[positions] = vertices[valid]
+    peak_amplitudes[positions] = heights[valid]
+
+    return peak_ws, peak_amplitudes
+
+
+# Resonance of an amplitudes vs w curve: the lowest w among its highest peaks,
+# refined between the grid points. None when the curve has no peak.
+def resonance(ws, amplitudes, peaks=3, method="parabolic"):
+    amplitudes = np.asarray(amplitudes, dtype=np.float64)
+
+    indices, _ = signal.find_peaks(amplitudes)
+    if len(indices) == 0:
+        return None
+
+    top = indices[np.argsort(amplitudes[indices])[::-1][:peaks]]
+    w0, _ = refine_peaks(ws, amplitudes, [np.min(top)], method)
+
+    return w0[0]
+
+
+# Least squares C of w0 = C * sqrt(k). The last axis holds the samples, so a
+# (samples, n) batch gives one constant per sample.
+def fit_sqrt_constant(ks, ws):
+    ks = np.asarray(ks, dtype=np.float64)
+    ws = np.asarray(ws, dtype=np.float64)
+
+    return np.sum(ws * np.sqrt(ks), axis=-1) / np.sum(ks, axis=-1)
+
+
+# Sum of squared residuals of w0 = C * sqrt(k) for every constant
+def sqrt_fit_errors(ks, ws, constants):
+    ks = np.asarray(ks, dtype=np.float64)
+    ws = np.asarray(ws, dtype=np.float64)
+    constants = np.asarray(constants, dtype=np.float64)
+
+    residuals = ws - constants[:, None] * np.sqrt(ks)
+
+    return np.sum(np.square(residuals), axis=-1)
+
+
+# Percentile bootstrap interval of the fitted C: all resamplings of the (k, w0)
+# pairs are drawn and fitted at once
+def bootstrap_sqrt_constant(
+    ks, ws, samples=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE, seed=None
+):
+    ks = np.asarray(ks, dtype=np.float64)
+    ws = np.asarray(ws, dtype=np.float64)
+
+    rng = np.random.default_rng(seed)
+    resampled = rng.integers(0, len(ks), size=(samples, len(ks)))
+    constants = fit_sqrt_constant(ks[resampled], ws[resampled])
+
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(constants, [tail, 100 - tail])
+
+    return low, high
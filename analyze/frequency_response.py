@@ -0,0 +1,73 @@
+import numpy as np
+
+# Frequencies solved together by amplitude_response, bounding the memory of
+# the (ws, N - 1) systems
+BLOCK_SIZE = 4096
+
+
+# Thomas algorithm for a batch of tridiagonal systems. lower, diagonal, upper
+# and rhs broadcast to (..., n), one system per leading index; lower[..., 0] and
+# upper[..., -1] are not used. Every system is eliminated at once, one row at a
+# time, so the loop runs over n and not over the batch. Singular systems give
+# inf or nan instead of raising.
+def solve_tridiagonal(lower, diagonal, upper, rhs):
+    lower, diagonal, upper, rhs = np.broadcast_arrays(
+        *[
+            np.asarray(values, dtype=np.float64)
+            for values in (lower, diagonal, upper, rhs)
+        ]
+    )
+
+    # Rows first, so each elimination step reads contiguous memory
+    lower, diagonal, upper, rhs = [
+        np.moveaxis(values, -1, 0) for values in (lower, diagonal, upper, rhs)
+    ]
+    n = len(diagonal)
+
+    factors = np.empty(diagonal.shape)
+    solution = np.empty(diagonal.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factors[0] = upper[0] / diagonal[0]
+        solution[0] = rhs[0] / diagonal[0]
+
+        for i in range(1, n):
+            pivot = diagonal[i] - lower[i] * factors[i - 1]
+            factors[i] = upper[i] / pivot
+            solution[i] = (rhs[i] - lower[i] * solution[i - 1]) / pivot
+
+        for i in range(n - 2, -1, -1):
+            solution[i] -= factors[i] * solution[i + 1]
+
+    return np.moveaxis(solution, 0, -1)
+
+
+# Steady-state response of the chain from coupled/App.java driven at each w:
+# the N - 1 free particles between the driver (A sin(w t)) and the wall move as
+# X_j sin(w t), with
+#   (2k - m w^2) X_j - k X_{j-1} - k X_{j+1} = 0,   X_0 = A, X_N = 0
+# Returns X, shaped (ws, N - 1); a negative X_j is in antiphase with the driver.
+def chain_response(ws, k, m, N, A):
+    ws = np.asarray(ws, dtype=np.float64)
+    n = N - 1
+
+    diagonal = (2 * k - m * np.square(ws))[:, None]
+    rhs = np.zeros((len(ws), n))
+    rhs[:, 0] = k * A
+
+    return solve_tridiagonal(-k, diagonal, -k, rhs)
+
+
+# Theoretical amplitude vs w curve: the largest steady-state amplitude along
+# the chain for each w, infinite at the normal frequencies
+def amplitude_response(ws, k, m, N, A):
+    ws = np.asarray(ws, dtype=np.float64)
+    amplitudes = np.empty(len(ws))
+
+    for start in range(0, len(ws), BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        amplitudes[block] = np.max(
+            np.abs(chain_response(ws[block], k, m, N, A)), axis=1
+        )
+
+    return amplitudes
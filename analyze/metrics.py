@@ -0,0 +1,56 @@
+import numpy as np
+
+# All kernels take positions as a (snapshots, N) array or a (runs, snapshots, N)
+# batch of them, and reduce over the last (particle) axis. For batches, m and k
+# may be per-run arrays shaped to broadcast against (runs, snapshots), e.g.
+# k[:, None].
+
+
+# Maximum distance to equilibrium for each snapshot
+def system_amplitudes(positions):
+    return np.max(np.abs(positions), axis=-1)
+
+
+def kinetic_energy(positions, dt, m):
+    positions = np.asarray(positions, dtype=np.float64)
+
+    if positions.shape[-2] < 2:
+        return np.zeros(positions.shape[:-1])
+
+    # Central differences inside, one-sided at both ends
+    velocities = np.gradient(positions, dt, axis=-2)
+
+    return 0.5 * m * np.sum(np.square(velocities), axis=-1)
+
+
+# Elastic energy of every spring in the chain, including the links to the
+# driver on the left (left, per snapshot) and the wall on the right (right)
+def potential_energy(positions, k, left=0.0, right=0.0):
+    positions = np.asarray(positions, dtype=np.float64)
+
+    shape = positions.shape[:-1] + (1,)
+    left = np.broadcast_to(np.asarray(left, dtype=np.float64)[..., None], shape)
+    right = np.broadcast_to(np.asarray(right, dtype=np.float64)[..., None], shape)
+
+    elongations = np.diff(np.concatenate([left, positions, right], axis=-1), axis=-1)
+
+    return 0.5 * k * np.sum(np.square(elongations), axis=-1)
+
+
+def compute_metrics(positions, dt=None, m=None, k=None, left=0.0, right=0.0):
+    positions = np.asarray(positions)
+    abs_positions = np.abs(positions)
+
+    metrics = {
+        "amplitudes": np.max(abs_positions, axis=-1),
+        "argmax_particle": np.argmax(abs_positions, axis=-1),
+        "particle_peaks": np.max(abs_positions, axis=-2),
+    }
+
+    if dt is not None and m is not None:
+        metrics["kinetic_energy"] = kinetic_energy(positions, dt, m)
+
+    if k is not None:
+        metrics["potential_energy"] = potential_energy(positions, k, left, right)
+
+    return metrics
@@ -0,0 +1,121 @@
+import numpy as np
+from scipy import signal
+import utils
+import normal_modes
+import fitting
+import chain_engine
+
+# Fraction of the chain where the free run is plucked, away from the nodes
+# of the lowest modes
+PLUCK_AT = 0.2
+
+# Integration step and snapshot period of the plucked run, relative to the
+# period of the highest mode of the chain, and its length in periods of the
+# lowest one
+STEPS_PER_PERIOD = 60
+STEPS_PER_SNAPSHOT = 6
+LOWEST_PERIODS = 100
+
+
+# Initial positions of the N - 1 free particles of a plucked run: the chain
+# plucked into a triangle of height A, which excites every mode with a weight
+# falling as 1 / n^2
+def pluck(N, A, at=PLUCK_AT):
+    x = np.arange(1, N) / N
+    return A * np.where(x < at, x / at, (1 - x) / (1 - at))
+
+
+# Spectrum of the snapshots of a run, taken dt apart. positions is a
+# (snapshots, particles) array; every particle is transformed at once with a
+# Hann window. Returns the angular frequencies and the amplitude spectrum of
+# each particle, shaped (frequencies, particles).
+def spectrum(positions, dt):
+    positions = np.asarray(positions, dtype=np.float64)
+    positions = positions - np.mean(positions, axis=0)
+
+    window = np.hanning(len(positions))
+    transform = np.fft.rfft(positions * window[:, None], axis=0)
+
+    # Scaled so a sinusoid of amplitude a reads a at its frequency
+    amplitudes = 2 * np.abs(transform) / np.sum(window)
+    omegas = 2 * np.pi * np.fft.rfftfreq(len(positions), dt)
+
+    return omegas, amplitudes
+
+
+# Normal modes of a run: the modes highest peaks of the spectrum summed over the
+# particles, refined between frequency bins and sorted by frequency. Returns
+# the frequencies, the amplitude of each mode over the whole chain (the norm of
+# the particle amplitudes) and the combined spectrum.
+def modal_peaks(positions, dt, modes=3):
+    omegas, amplitudes = spectrum(positions, dt)
+    combined = np.sqrt(np.sum(np.square(amplitudes), axis=1))
+
+    peaks, _ = signal.find_peaks(combined)
+    peaks = np.sort(peaks[np.argsort(combined[peaks])[::-1][:modes]])
+
+    # A parabola through the log of a Hann peak is close to exact
+    with np.errstate(divide="ignore"):
+        frequencies, heights = fitting.refine_peaks(
+            omegas, np.log(combined), peaks, method="parabolic"
+        )
+
+    return frequencies, np.exp(heights), (omegas, combined)
+
+
+# Integration step, snapshot period and length of the plucked run of a chain
+def pluck_schedule(k, m, N):
+    modes = normal_modes.normal_frequencies(k, m, N)
+
+    dt = 2 * np.pi / modes[-1] / STEPS_PER_PERIOD
+    dt2 = dt * STEPS_PER_SNAPSHOT
+    tf = LOWEST_PERIODS * 2 * np.pi / modes[0]
+
+    return dt, dt2, tf
+
+
+# One free, plucked run per k, integrated together with the NumPy engine (the
+# driver stays at rest), and the normal modes of each. Returns one dict per k
+# with the measured "frequencies" and "amplitudes", the "harmonics" from
+# normal_modes and the combined "spectrum".
+def pluck_modes(ks, m, A, N, modes=3):
+    schedules = np.array([pluck_schedule(k, m, N) for k in ks])
+    runs = chain_engine.simulate_chain(
+        ks,
+        0,
+        m,
+        A,
+        N,
+        schedules[:, 0],
+        schedules[:, 1],
+        schedules[:, 2],
+        record_positions=True,
+        initial_positions=np.tile(pluck(N, A), (len(ks), 1)),
+    )
+
+    # Snapshots are a whole number of steps apart, as in the JAR
+    return [
+        modal_analysis(
+            k,
+            m,
+            N,
+            run["positions"],
+            dt * utils.simulation_schedule(dt, dt2, tf)[1],
+            modes,
+        )
+        for k, run, (dt, dt2, tf) in zip(ks, runs, schedules)
+    ]
+
+
+# Normal modes of any run with positions (e.g. a forced run from the results
+# store) next to the theoretical ones
+def modal_analysis(k, m, N, positions, dt, modes=3):
+    frequencies, amplitudes, spectrum = modal_peaks(positions, dt, modes)
+
+    return {
+        "k": k,
+        "frequencies": frequencies,
+        "amplitudes": amplitudes,
+        "harmonics": normal_modes.normal_frequencies(k, m, N)[:modes],
+        "spectrum": spectrum,
+    }
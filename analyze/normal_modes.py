@@ -0,0 +1,66 @@
+import os
+import uuid
+import numpy as np
+from scipy import linalg
+
+# Unit chain (k = m = 1) solutions computed so far, by kind and N
+_modes = {}
+
+
+# Value of kind for the chain of N particles from memory, then from root (when
+# given), computing and saving it otherwise. Files are written to a temporary
+# name and renamed, so concurrent sweeps never read a partial one.
+def _cached(kind, N, compute, root):
+    if (kind, N) in _modes:
+        return _modes[(kind, N)]
+
+    path = os.path.join(root, f"{kind}_N-{N}.npy") if root is not None else None
+
+    if path is not None and os.path.exists(path):
+        value = np.load(path)
+    else:
+        value = compute()
+
+        if path is not None:
+            os.makedirs(root, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.npy"
+            np.save(tmp_path, value)
+            os.replace(tmp_path, path)
+
+    value.setflags(write=False)
+    _modes[(kind, N)] = value
+
+    return value
+
+
+# The N - 1 free particles of the chain from coupled/App.java, between the
+# driver at rest and the wall, oscillate as m x'' = -k L x with L the symmetric
+# tridiagonal matrix with 2 on the diagonal and -1 beside it. The eigenvalues of
+# L are (m / k) w^2, so a single solve per N serves every k and m.
+def _unit_chain(N):
+    n = int(N) - 1
+    return np.full(n, 2.0), np.full(n - 1, -1.0)
+
+
+# Angular frequencies of all N - 1 normal modes, ascending. The unit chain
+# eigenvalues are memoized by N and, when root is given, persisted there.
+def normal_frequencies(k, m, N, root=None):
+    def compute():
+        return linalg.eigh_tridiagonal(*_unit_chain(N), eigvals_only=True)
+
+    eigenvalues = _cached("eigenvalues", int(N), compute, root)
+
+    return np.sqrt(k / m) * np.sqrt(np.maximum(eigenvalues, 0))
+
+
+# Frequencies and mode shapes, the shape of mode i being the unit column
+# shapes[:, i] (particle 1 first). Shapes do not depend on k or m and take
+# (N - 1)^2 values, so they are only computed when asked for.
+def normal_modes(k, m, N, root=None):
+    def compute():
+        _, shapes = linalg.eigh_tridiagonal(*_unit_chain(N))
+
+        # Sign convention: every mode starts moving up at particle 1
+        return shapes * np.where(shapes[0] < 0, -1, 1)
+
+    return normal_frequencies(k, m, N, root), _cached("shapes", int(N), compute, root)
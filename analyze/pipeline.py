@@ -0,0 +1,94 @@
+import concurrent.futures
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+# Arrays at least this big are sent back from workers through shared memory
+# instead of being pickled
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+
+def _pack(value):
+    if isinstance(value, dict):
+        return {key: _pack(item) for key, item in value.items()}
+
+    if isinstance(value, np.ndarray) and value.nbytes >= SHARED_MEMORY_THRESHOLD:
+        block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+        np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+        packed = ("shared_memory", block.name, value.shape, value.dtype.str)
+
+        # The receiving side unlinks it once copied out
+        block.close()
+
+        return packed
+
+    return value
+
+
+def unpack(value):
+    if isinstance(value, dict):
+        return {key: unpack(item) for key, item in value.items()}
+
+    if isinstance(value, tuple) and len(value) == 4 and value[0] == "shared_memory":
+        _, name, shape, dtype = value
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+        finally:
+            block.close()
+            block.unlink()
+
+        return array
+
+    return value
+
+
+def _run(function, args):
+    return _pack(function(*args))
+
+
+def _result(future):
+    try:
+        return unpack(future.result())
+    except Exception as e:
+        return e
+
+
+# Process pool for the parse/reduce stage of a sweep. Tasks are submitted as
+# soon as their simulation finishes, so analysis overlaps with the simulations
+# still running; results come back through shared memory (see unpack).
+class AnalysisPipeline:
+    def __init__(self, function, max_workers=None):
+        # Workers must share our resource tracker, otherwise each one would try
+        # to clean up the blocks it handed over when it exits
+        resource_tracker.ensure_running()
+
+        self.function = function
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        self.futures = []
+
+    def submit(self, *args):
+        future = self.executor.submit(_run, self.function, args)
+        self.futures.append(future)
+        return future
+
+    # Yields each task's result, or the exception it raised, as tasks finish
+    def results(self):
+        futures, self.futures = self.futures, []
+        for future in concurrent.futures.as_completed(futures):
+            yield _result(future)
+
+    # Same as results, for the tasks finished so far only, without waiting
+    def ready(self):
+        done = {future for future in self.futures if future.done()}
+        self.futures = [future for future in self.futures if future not in done]
+        for future in done:
+            yield _result(future)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
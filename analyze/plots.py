@@ -197,14 +197,86 @@ def plot_amplitudes_vs_time(
     plt.close()
 
 
+# Energy of each of the lowest normal modes over time, one line per mode; the
+# mode the driver resonates with stands out after a few periods
+def plot_mode_energies_vs_time(
+    times, energies, text, file_name="mode_energies_vs_time.png"
+):
+    plt.figure(figsize=(10, 6))
+
+    energies = np.asarray(energies)
+    for mode in range(energies.shape[1]):
+        plt.semilogy(times, energies[:, mode], label=f"Modo {mode + 1}")
+
+    plt.xlabel("Tiempo (s)")
+    plt.ylabel("Energía (J)")
+
+    # Shrinks the plot by 20%
+    ax = plt.gca()
+    box = ax.get_position()
+    ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
+
+    _text_box(ax).set_text(text)
+
+    plt.legend(loc="upper left", bbox_to_anchor=(1.05, 0.5))
+
+    plt.savefig(file_name)
+
+    plt.close()
+
+
+# Batch version of plot_amplitudes_vs_time: the figure, axes and text box are
+# laid out once and every render only updates the line data, limits and text
+class AmplitudesVsTimeRenderer:
+    def __init__(self):
+        self.figure = plt.figure(figsize=(10, 6))
+        (self.line,) = plt.plot([], [])
+
+        plt.xlabel("Tiempo (s)")
+        plt.ylabel("Amplitud (m)")
+
+        # Shrinks the plot by 20%
+        self.ax = plt.gca()
+        box = self.ax.get_position()
+        self.ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
+
+        self.text = _text_box(self.ax)
+
+    def render(self, times, amplitudes, text, file_name="amplitudes_vs_time.png"):
+        self.line.set_data(times, amplitudes)
+
+        y_max = max(amplitudes)
+
+        _autoscale(self.ax)
+        self.ax.set_ylim(
+            0,
+            y_max + 0.1 * y_max,
+        )
+
+        self.text.set_text(text)
+
+        self.figure.savefig(file_name)
+
+    def close(self):
+        plt.close(self.figure)
+
+
 def plot_amplitudes_vs_w(
-    ws, normal_frequencies, amplitudes, text, file_name="amplitudes_vs_w.png"
+    ws,
+    normal_frequencies,
+    amplitudes,
+    text,
+    file_name="amplitudes_vs_w.png",
+    response=None,
 ):
     plt.figure(figsize=(10, 6))
 
     # Plot each segment as a separate line
     plt.plot(ws, amplitudes, marker="o", markersize=2, linestyle=":", color="C0")
 
+    if response is not None:
+        _plot_response(plt.gca(), response)
+
     plt.xlabel("w (rad/s)")
     plt.ylabel("Amplitud (m)")
 
@@ -268,6 +340,9 @@ def plot_amplitudes_vs_w(
             color="C0",
         )
 
+    if response is not None:
+        _plot_response(plt.gca(), response)
+
     plt.xlabel("w (rad/s)")
     plt.ylabel("Amplitud (m)")
 
@@ -304,6 +379,46 @@ def plot_resonances_vs_k(ks, resonances, file_name="resonances_vs_k.png"):
     plt.close()
 
 
+def plot_modal_spectrum(
+    omegas, amplitudes, frequencies, harmonics, file_name="modal_spectrum.png"
+):
+    plt.figure(figsize=(10, 6))
+
+    plt.semilogy(omegas, amplitudes, linestyle="-", label="Espectro")
+
+    for i, harmonic in enumerate(harmonics):
+        plt.axvline(
+            x=harmonic,
+            color="red",
+            linestyle="--",
+            linewidth=1,
+            label="Modos teóricos" if i == 0 else None,
+        )
+
+    plt.plot(
+        frequencies,
+        np.interp(frequencies, omegas, amplitudes),
+        marker="o",
+        markersize=5,
+        linestyle="",
+        color="k",
+        label="Modos medidos",
+    )
+
+    # Up to a bit past the highest mode shown, and down to the noise floor
+    plt.xlim(0, 1.5 * max(max(harmonics), max(frequencies)))
+    plt.ylim(bottom=np.max(amplitudes) * 1e-9)
+
+    plt.xlabel("w (rad/s)")
+    plt.ylabel("Amplitud (m)")
+
+    plt.legend()
+
+    plt.savefig(file_name)
+
+    plt.close()
+
+
 def plot_resonance_with_best_constant_vs_k(
     ks, resonances, best_constant, file_name="resonances_with_best_constant_vs_k.png"
 ):
@@ -365,3 +480,146 @@ def plot_cuadratic_error_vs_constant(
     plt.savefig(file_name)
 
     plt.close()
+
+
+# Batch version of plot_amplitudes_vs_w, reusing both figures; the response,
+# segment and asymptote lines are replaced on every render
+class AmplitudesVsWRenderer:
+    def __init__(self):
+        self.figure = plt.figure(figsize=(10, 6))
+        (self.line,) = plt.plot(
+            [], [], marker="o", markersize=2, linestyle=":", color="C0"
+        )
+        self.ax, self.text = _amplitudes_vs_w_layout()
+        self.response_lines = []
+
+        self.asymptote_figure = plt.figure(figsize=(10, 6))
+        self.asymptote_ax, self.asymptote_text = _amplitudes_vs_w_layout()
+        self.asymptote_lines = []
+
+    def render(
+        self,
+        ws,
+        normal_frequencies,
+        amplitudes,
+        text,
+        file_name="amplitudes_vs_w.png",
+        response=None,
+    ):
+        for line in self.response_lines:
+            line.remove()
+        self.response_lines = []
+
+        self.line.set_data(ws, amplitudes)
+        _autoscale(self.ax)
+        if response is not None:
+            self.response_lines = _plot_response(self.ax, response)
+        self.text.set_text(text)
+
+        self.figure.savefig(file_name)
+
+        for line in self.asymptote_lines:
+            line.remove()
+        self.asymptote_lines = []
+
+        # Same asymptotes and segments as plot_amplitudes_vs_w
+        normal_frequencies = [w for w in normal_frequencies if any(w < ws)]
+        for normal_freq in normal_frequencies:
+            self.asymptote_lines.append(
+                self.asymptote_ax.axvline(
+                    x=normal_freq, color="red", linestyle="--", linewidth=0.5
+                )
+            )
+
+        segments = []
+        for freq in normal_frequencies:
+            prev_ws = [w for w in ws if w < freq]
+            prev_amps = [amp for w, amp in zip(ws, amplitudes) if w < freq]
+
+            if prev_ws:
+                segments.append((prev_ws, prev_amps))
+
+        last = [
+            (w, amp)
+            for w, amp in zip(ws, amplitudes)
+            if all(w >= freq for freq in normal_frequencies)
+        ]
+        if last:
+            segments.append(([w for w, _ in last], [amp for _, amp in last]))
+
+        for segment_ws, segment_amplitudes in segments:
+            self.asymptote_lines.extend(
+                self.asymptote_ax.plot(
+                    segment_ws,
+                    segment_amplitudes,
+                    marker="o",
+                    markersize=2,
+                    linestyle=":",
+                    color="C0",
+                )
+            )
+
+        _autoscale(self.asymptote_ax)
+        if response is not None:
+            self.asymptote_lines.extend(_plot_response(self.asymptote_ax, response))
+        self.asymptote_text.set_text(text)
+
+        self.asymptote_figure.savefig(file_name.replace(".png", "_asimptote.png"))
+
+    def close(self):
+        plt.close(self.figure)
+        plt.close(self.asymptote_figure)
+
+
+def _amplitudes_vs_w_layout():
+    plt.xlabel("w (rad/s)")
+    plt.ylabel("Amplitud (m)")
+
+    # Shrinks the plot by 20%
+    ax = plt.gca()
+    box = ax.get_position()
+    ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
+
+    return ax, _text_box(ax)
+
+
+# Theoretical amplitude vs w curve, (ws, amplitudes) from frequency_response,
+# drawn over the simulated one. It diverges at the normal frequencies, so the
+# limits of the simulated amplitudes are kept.
+def _plot_response(ax, response):
+    ylim = ax.get_ylim()
+
+    response_ws, response_amplitudes = response
+    response_amplitudes = np.asarray(response_amplitudes, dtype=np.float64)
+    lines = ax.plot(
+        response_ws,
+        np.where(np.isfinite(response_amplitudes), response_amplitudes, np.nan),
+        linestyle="-",
+        linewidth=1,
+        color="C1",
+    )
+
+    ax.set_ylim(ylim)
+
+    return lines
+
+
+# Text box to the right of the plot, as in the amplitude plots
+def _text_box(ax):
+    return ax.text(
+        1.05,
+        0.8,
+        "",
+        transform=ax.transAxes,
+        fontsize=16,
+        verticalalignment="top",
+        bbox=dict(facecolor="none", edgecolor="grey", boxstyle="round,pad=0.1"),
+    )
+
+
+# Recomputes the data limits from the current artists and turns autoscaling
+# back on, as on a freshly created axes
+def _autoscale(ax):
+    ax.relim()
+    ax.set_autoscale_on(True)
+    ax.autoscale_view()
@@ -0,0 +1,88 @@
+import concurrent.futures
+import matplotlib
+import numpy as np
+import results_store
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+# Argument for a figure job: a reference to the column's .npy file when the run
+# comes from the results store, so the worker memory-maps it instead of
+# receiving a pickled copy, or the value itself otherwise
+def column(result, key):
+    if isinstance(result, results_store.StoredRun) and key in result.columns:
+        return ("npy", result.column_path(key))
+
+    return result[key]
+
+
+def resolve(value):
+    if (
+        isinstance(value, tuple)
+        and len(value) == 2
+        and isinstance(value[0], str)
+        and value[0] == "npy"
+    ):
+        return np.load(value[1], mmap_mode="r")
+
+    return value
+
+
+# Batch renderers (classes from plots with a render method) built so far by
+# this worker, reused by every job of the same kind
+_batch_renderers = {}
+
+
+def _render(plot, args, kwargs):
+    if isinstance(plot, type):
+        if plot not in _batch_renderers:
+            _batch_renderers[plot] = plot()
+        plot = _batch_renderers[plot].render
+
+    plot(
+        *[resolve(arg) for arg in args],
+        **{key: resolve(value) for key, value in kwargs.items()},
+    )
+
+
+# Process pool rendering figures with the Agg backend. Each job is a function
+# or batch renderer class from plots and its arguments; figures are written by
+# the workers, so only the arguments (see column) travel to them.
+class FigureRenderer:
+    def __init__(self, max_workers=None):
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker
+        )
+        self.futures = []
+
+    def submit(self, plot, *args, **kwargs):
+        future = self.executor.submit(_render, plot, args, kwargs)
+        self.futures.append(future)
+        return future
+
+    # Waits for every submitted figure, printing the ones that failed
+    def wait(self):
+        failed = 0
+
+        for future in concurrent.futures.as_completed(self.futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error rendering figure: {e}")
+                failed += 1
+
+        self.futures = []
+
+        return failed
+
+    def shutdown(self):
+        self.wait()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+from collections.abc import Mapping
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+JOURNAL_FILE = "journal.jsonl"
+
+# Keys every run is indexed by in the manifest, taken from its parameters
+INDEX_KEYS = {"k": "K", "w": "W", "integrator": "Integrator", "dt": "Dt"}
+
+
+# A run read from the store. Scalar values come from the manifest and array
+# columns are memory-mapped from their .npy file the first time they are used.
+class StoredRun(Mapping):
+    def __init__(self, root, entry):
+        self.root = root
+        self.entry = entry
+        self.columns = entry["columns"]
+        self._loaded = {}
+
+    def column_path(self, key):
+        return os.path.join(self.root, self.entry["id"], f"{key}.npy")
+
+    def __getitem__(self, key):
+        if key in self.columns:
+            if key not in self._loaded:
+                self._loaded[key] = np.load(self.column_path(key), mmap_mode="r")
+            return self._loaded[key]
+
+        return self.entry["values"][key]
+
+    def __iter__(self):
+        yield from self.entry["values"]
+        yield from self.columns
+
+    def __len__(self):
+        return len(self.entry["values"]) + len(self.columns)
+
+
+def _save_column(path, value, sync):
+    with open(path, "wb") as f:
+        np.save(f, np.asarray(value))
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# One directory per run holding one .npy file per column, indexed by a small
+# manifest.json. Runs added with append_run are also recorded in journal.jsonl
+# as soon as they are written, so a sweep that dies halfway keeps them;
+# compact() folds the journal into the manifest.
+class ResultsStore:
+    def __init__(self, root):
+        self.root = root
+        self.entries = []
+
+        manifest_file = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r") as f:
+                self.entries = json.load(f)["runs"]
+
+        self._replay_journal()
+
+    @staticmethod
+    def exists(root):
+        return os.path.exists(os.path.join(root, MANIFEST_FILE)) or os.path.exists(
+            os.path.join(root, JOURNAL_FILE)
+        )
+
+    def _replay_journal(self):
+        journal_file = os.path.join(self.root, JOURNAL_FILE)
+        if not os.path.exists(journal_file):
+            return
+
+        known = {entry["id"] for entry in self.entries}
+        valid = 0
+
+        with open(journal_file, "rb+") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Incomplete line")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Line cut short by a crash, drop it so later appends are
+                    # not glued to it
+                    f.truncate(valid)
+                    break
+
+                valid += len(line)
+
+                if entry["id"] not in known:
+                    self.entries.append(entry)
+                    known.add(entry["id"])
+
+    def add_run(self, result, sync=False):
+        run_id = f"run-{len(self.entries):05d}"
+        run_dir = os.path.join(self.root, run_id)
+
+        # Left over by a run that was being written when a sweep died
+        if os.path.exists(run_dir):
+            shutil.rmtree(run_dir)
+        os.makedirs(run_dir)
+
+        values = {}
+        columns = []
+
+        for key, value in result.items():
+            if isinstance(value, (list, tuple, np.ndarray)):
+                _save_column(os.path.join(run_dir, f"{key}.npy"), value, sync)
+                columns.append(key)
+            else:
+                values[key] = value
+
+        parameters = values.get("parameters", {})
+        for key, parameter in INDEX_KEYS.items():
+            if key not in values and parameter in parameters:
+                values[key] = parameters[parameter]
+
+        entry = {"id": run_id, "values": values, "columns": columns}
+        self.entries.append(entry)
+
+        return StoredRun(self.root, entry)
+
+    # add_run, then records the run in the journal once its columns are on disk
+    def append_run(self, result):
+        run = self.add_run(result, sync=True)
+
+        with open(os.path.join(self.root, JOURNAL_FILE), "a") as f:
+            f.write(json.dumps(run.entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        return run
+
+    # Writes the manifest with every run, journaled ones included, and drops
+    # the journal
+    def compact(self):
+        self.save()
+
+        journal_file = os.path.join(self.root, JOURNAL_FILE)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+
+        manifest_file = os.path.join(self.root, MANIFEST_FILE)
+        with open(manifest_file + ".tmp", "w") as f:
+            json.dump({"runs": self.entries}, f)
+        os.replace(manifest_file + ".tmp", manifest_file)
+
+    # Runs whose manifest values match every filter, e.g. runs(k=100)
+    def runs(self, **filters):
+        return [
+            StoredRun(self.root, entry)
+            for entry in self.entries
+            if all(entry["values"].get(key) == value for key, value in filters.items())
+        ]
+
+
+# Store to append a sweep's runs to. Unless resuming, the store left under
+# root by a previous sweep is discarded.
+def open_store(root, resume=False):
+    if not resume and os.path.exists(root):
+        shutil.rmtree(root)
+
+    os.makedirs(root, exist_ok=True)
+
+    return ResultsStore(root)
+
+
+# Lazily loaded runs from the store under output_dir, falling back to a
+# results.json written by older versions
+def load_results(output_dir, **filters):
+    root = os.path.join(output_dir, "results")
+
+    if ResultsStore.exists(root):
+        return ResultsStore(root).runs(**filters)
+
+    with open(os.path.join(output_dir, "results.json"), "r") as f:
+        results = json.load(f)
+
+    return [
+        result
+        for result in results
+        if all(result.get(key) == value for key, value in filters.items())
+    ]
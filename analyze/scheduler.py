@@ -0,0 +1,140 @@
+import os
+import math
+import concurrent.futures
+
+MIB = 1024 * 1024
+
+# JVM heap held per snapshot value until the output is written: a boxed Double
+# plus its reference in the snapshot list, and per snapshot the list itself and
+# its node in the list of snapshots
+HEAP_BYTES_PER_VALUE = 24
+HEAP_BYTES_PER_SNAPSHOT = 96
+
+# Heap every run needs regardless of its size, and the safety factor applied on
+# top of the estimate
+HEAP_BASE = 64 * MIB
+HEAP_MARGIN = 1.5
+MIN_HEAP = 128 * MIB
+
+# Memory of a JVM outside its heap (metaspace, code cache, thread stacks)
+JVM_OVERHEAD = 128 * MIB
+
+# Relative runtime cost of one integration step per particle (plus a fixed
+# part per step) and of formatting one snapshot value into dynamic.txt
+STEP_COST = 1
+STEP_OVERHEAD = 4
+WRITE_COST = 40
+
+# Fraction of the available RAM the scheduler may fill with JVMs
+MEMORY_FRACTION = 0.8
+DEFAULT_MEMORY = 8 * 1024 * MIB
+
+
+# One simulation of a sweep with the estimates the scheduler packs it by.
+# parameters is passed as is to the function the scheduler runs.
+class Job:
+    def __init__(self, parameters, dt, dt2, tf, particles, stream=False):
+        self.parameters = parameters
+
+        self.steps = math.ceil(tf / dt)
+        self.snapshots = self.steps // max(round(dt2 / dt), 1)
+
+        # Streamed runs do not keep their snapshots
+        kept = 0 if stream else self.snapshots
+        heap = HEAP_BASE + kept * (
+            particles * HEAP_BYTES_PER_VALUE + HEAP_BYTES_PER_SNAPSHOT
+        )
+        self.heap = max(math.ceil(heap * HEAP_MARGIN / (64 * MIB)) * 64 * MIB, MIN_HEAP)
+        self.footprint = self.heap + JVM_OVERHEAD
+
+        self.cost = (
+            self.steps * (particles * STEP_COST + STEP_OVERHEAD)
+            + self.snapshots * particles * WRITE_COST
+        )
+
+    # -Xmx style value, e.g. "512m"
+    @property
+    def memory(self):
+        return f"{self.heap // MIB}m"
+
+
+# Jobs run by one JVM in batch mode (see JobRunner.java), threads of them at
+# once. They are listed longest first, so the thread pool of the JVM starts
+# each job as soon as a thread is free, as run() does with JVMs. Its heap must
+# hold the threads biggest jobs together.
+class Batch:
+    def __init__(self, jobs, threads):
+        self.jobs = sorted(jobs, key=lambda job: job.cost, reverse=True)
+        self.parameters = [job.parameters for job in self.jobs]
+        self.threads = max(1, min(threads, len(self.jobs)))
+
+        heaps = sorted((job.heap for job in self.jobs), reverse=True)
+        self.heap = sum(heaps[: self.threads])
+
+    # -Xmx style value, e.g. "512m"
+    @property
+    def memory(self):
+        return f"{self.heap // MIB}m"
+
+
+def available_memory():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return DEFAULT_MEMORY
+
+
+# Runs jobs longest-first, keeping at most cores of them running and the sum of
+# their footprints under memory. When the next longest job does not fit, the
+# longest one that does is started instead; a job bigger than the whole budget
+# runs alone.
+class SweepScheduler:
+    def __init__(self, memory=None, cores=None):
+        self.memory = (
+            memory if memory is not None else available_memory() * MEMORY_FRACTION
+        )
+        self.cores = cores if cores is not None else (os.cpu_count() or 1)
+
+    # All the jobs in one JVM, running as many of them at once as the cores and
+    # memory allow
+    def batch(self, jobs):
+        return Batch(jobs, self._threads(jobs))
+
+    # Jobs that fit in one JVM at once
+    def _threads(self, jobs):
+        used = JVM_OVERHEAD
+        threads = 0
+
+        for heap in sorted((job.heap for job in jobs), reverse=True)[: self.cores]:
+            if threads and used + heap > self.memory:
+                break
+            used += heap
+            threads += 1
+
+        return threads
+
+    # Yields (job, future) of function(job) for every job as they finish
+    def run(self, jobs, function):
+        pending = sorted(jobs, key=lambda job: job.cost, reverse=True)
+        running = {}
+        used = 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.cores) as executor:
+            while pending or running:
+                for job in list(pending):
+                    if len(running) >= self.cores:
+                        break
+                    if running and used + job.footprint > self.memory:
+                        continue
+
+                    pending.remove(job)
+                    running[executor.submit(function, job)] = job
+                    used += job.footprint
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    job = running.pop(future)
+                    used -= job.footprint
+                    yield job, future
@@ -0,0 +1,233 @@
+import os
+import time
+import json
+import collections
+import uuid
+import shutil
+import hashlib
+import subprocess
+import utils
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024
+
+# Cap of the parsed trajectories (.npy) stored next to the outputs, see
+# utils.parse_dynamic_file. They count towards max_bytes too.
+DEFAULT_TRAJECTORY_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+# Output lines of a batch JVM kept to explain the jobs it did not finish
+OUTPUT_LINES = 20
+
+# Age (s) after which prune() takes a tmp- output for the leftover of a killed
+# batch rather than one a running sweep is still writing
+STALE_TMP_AGE = 24 * 60 * 60
+
+_jar_versions = {}
+
+
+# Content hash of the jar, memoized by its path, size and mtime
+def jar_version(jar):
+    stat = os.stat(jar)
+    memo_key = (os.path.abspath(jar), stat.st_size, stat.st_mtime_ns)
+
+    if memo_key not in _jar_versions:
+        digest = hashlib.sha256()
+        with open(jar, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _jar_versions[memo_key] = digest.hexdigest()
+
+    return _jar_versions[memo_key]
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value
+    return float(value)
+
+
+# Simulation outputs stored under root/<key>, where key hashes the jar contents
+# and every simulation parameter. Entries survive across sweeps and are shared
+# by both drivers; prune() keeps the total size under max_bytes by evicting the
+# least recently used entries, after evicting parsed trajectories past
+# trajectory_max_bytes.
+class SimulationCache:
+    def __init__(
+        self,
+        root=DEFAULT_CACHE_DIR,
+        max_bytes=DEFAULT_CACHE_MAX_BYTES,
+        trajectory_max_bytes=DEFAULT_TRAJECTORY_MAX_BYTES,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.trajectory_max_bytes = trajectory_max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, jar, parameters):
+        content = json.dumps(
+            {
+                "jar": jar_version(jar),
+                "parameters": {
+                    name: _normalize(value) for name, value in parameters.items()
+                },
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key):
+        entry_dir = os.path.join(self.root, key)
+
+        if not os.path.isdir(entry_dir):
+            return None
+
+        # Mark as recently used
+        os.utime(entry_dir)
+
+        return entry_dir
+
+    # Runs many simulations in one JVM, through the batch mode of the jar (see
+    # JobRunner.java), threads of them at once (defaults to the cores). Cached
+    # simulations are not run again. Yields (index in parameters_list, entry
+    # directory) for each simulation as soon as it finishes, or the
+    # subprocess.CalledProcessError it failed with in place of the directory.
+    def execute_batch(self, jar, parameters_list, java_options=(), threads=None):
+        pending = []
+        lines = []
+
+        for index, parameters in enumerate(parameters_list):
+            key = self.key(jar, parameters)
+
+            entry_dir = self.get(key)
+            if entry_dir is not None:
+                yield index, entry_dir
+                continue
+
+            tmp_dir = os.path.join(self.root, f"tmp-{key}-{uuid.uuid4().hex}")
+            options = ["-out", tmp_dir]
+            for name, value in parameters.items():
+                options.extend([f"-{name}", str(value)])
+
+            # One line per job, options separated by tabs
+            for option in options:
+                if "\t" in option or "\n" in option:
+                    raise ValueError(
+                        f"Job option {option!r} contains a tab or a newline"
+                    )
+
+            pending.append((index, key, tmp_dir))
+            lines.append("\t".join(options))
+
+        if not pending:
+            return
+
+        jobs_file = os.path.join(self.root, f"tmp-jobs-{uuid.uuid4().hex}.txt")
+        with open(jobs_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        command = ["java", *java_options, "-jar", jar, "-jobs", jobs_file]
+        if threads is not None:
+            command.extend(["-threads", str(threads)])
+
+        # Last lines that are not statuses, the reason of jobs the JVM died in
+        output = collections.deque(maxlen=OUTPUT_LINES)
+        finished = set()
+
+        try:
+            with subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+            ) as process:
+                try:
+                    # "JOB <line> OK" or "JOB <line> FAILED <reason>"
+                    for line in process.stdout:
+                        fields = line.split(maxsplit=3)
+                        if not (
+                            len(fields) >= 3
+                            and fields[0] == "JOB"
+                            and fields[1].isdigit()
+                        ):
+                            output.append(line)
+                            continue
+
+                        job = int(fields[1])
+                        finished.add(job)
+                        reason = fields[3].strip() if len(fields) > 3 else ""
+                        yield self._store(
+                            pending[job], fields[2] == "OK", command, reason
+                        )
+
+                    process.wait()
+                finally:
+                    # The caller stopped early
+                    if process.poll() is None:
+                        process.kill()
+                        process.wait()
+                        for job, (_, _, tmp_dir) in enumerate(pending):
+                            if job not in finished:
+                                shutil.rmtree(tmp_dir, ignore_errors=True)
+        finally:
+            os.remove(jobs_file)
+
+        for job, entry in enumerate(pending):
+            if job not in finished:
+                yield self._store(entry, False, command, "".join(output))
+
+    # Moves the output of a finished batch job to its entry, returning
+    # (index, entry directory) or (index, subprocess.CalledProcessError)
+    def _store(self, entry, ok, command, reason):
+        index, key, tmp_dir = entry
+
+        if not ok:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return index, subprocess.CalledProcessError(1, command, stderr=reason)
+
+        entry_dir = os.path.join(self.root, key)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another worker stored the same simulation first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return index, entry_dir
+
+    def prune(self):
+        utils.prune_trajectory_cache(self.root, self.trajectory_max_bytes)
+
+        entries = []
+        now = time.time()
+
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+
+            if name.startswith("tmp-"):
+                try:
+                    if now - os.path.getmtime(entry_dir) > STALE_TMP_AGE:
+                        if os.path.isdir(entry_dir):
+                            shutil.rmtree(entry_dir, ignore_errors=True)
+                        else:
+                            os.remove(entry_dir)
+                except FileNotFoundError:
+                    # Renamed or removed by the sweep that owned it
+                    pass
+                continue
+
+            if not os.path.isdir(entry_dir):
+                continue
+
+            size = sum(
+                os.path.getsize(os.path.join(dir_path, file_name))
+                for dir_path, _, file_names in os.walk(entry_dir)
+                for file_name in file_names
+            )
+            entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+        return total
@@ -0,0 +1,47 @@
+import numpy as np
+import utils
+import chain_engine
+import normal_modes
+
+
+# First steps of VerletIntegrator for a chain displaced at rest, without driver
+def _java_verlet(k, m, y, dt, steps):
+    def force(y):
+        padded = np.concatenate([[0], y, [0]])
+        return -k * (2 * y - padded[:-2] - padded[2:])
+
+    prev = y + dt**2 / (2 * m) * force(y)
+    positions = []
+    for _ in range(steps):
+        y, prev = 2 * y - prev + dt**2 / m * force(y), y
+        positions.append(y)
+
+    return np.array(positions)
+
+
+def test_displaced_start_matches_java():
+    k, m, N, dt = 100, 0.001, 10, 1e-4
+    y = np.linspace(0.01, -0.005, N - 1)
+
+    run = chain_engine.simulate_chain(
+        [k], 0, m, 0.01, N, dt, dt, 20 * dt, True, initial_positions=[y]
+    )[0]
+    expected = _java_verlet(k, m, y, dt, len(run["positions"]) + 1)[1:]
+
+    np.testing.assert_allclose(run["positions"], expected, rtol=0, atol=1e-15)
+
+
+def test_displaced_mode_oscillates_in_place():
+    k, m, N, A = 100, 0.001, 10, 0.01
+    frequencies, shapes = normal_modes.normal_modes(k, m, N)
+    dt = 2 * np.pi / frequencies[-1] / 200
+
+    run = chain_engine.simulate_chain(
+        [k], 0, m, A, N, dt, dt, 0.1, True, initial_positions=[A * shapes[:, 0]]
+    )[0]
+
+    # Snapshots at the times the integrator reached, not the nominal ones
+    times = utils.snapshot_times(dt, dt, 0.1)[: len(run["positions"])]
+    expected = A * np.cos(frequencies[0] * times)[:, None] * shapes[:, 0]
+
+    np.testing.assert_allclose(run["positions"], expected, rtol=0, atol=1e-3 * A)
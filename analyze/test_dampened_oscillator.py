@@ -0,0 +1,90 @@
+import os
+import concurrent.futures
+import pytest
+import pipeline
+import results_store
+import dampened_oscillator
+
+DTS = [1e-3, 2e-3, 4e-3, 8e-3]
+
+
+class Killed(Exception):
+    pass
+
+
+# Analysis pipeline that lets the fake batch see the parsing tasks
+class _Pipeline(pipeline.AnalysisPipeline):
+    submitted = []
+
+    def submit(self, *args):
+        future = super().submit(*args)
+        self.submitted.append(future)
+        return future
+
+
+# Stands in for the JVM batch: writes the output of each job and yields its
+# directory once the previous one has been parsed, dying after die_after jobs
+def _fake_batch(root, die_after=None, ran=None):
+    def execute_batch(gamma, k, m, A, tf, batch, cache):
+        if ran is not None:
+            ran.extend(batch.parameters)
+
+        for count, (i, dt, dt2) in enumerate(batch.parameters):
+            if count == die_after:
+                raise Killed()
+
+            dir = os.path.join(root, f"{i}-{dt}")
+            os.makedirs(dir)
+            with open(os.path.join(dir, "static.txt"), "w") as f:
+                f.write("\n".join(map(str, [m, k, gamma, A, dt, dt2, tf, i])) + "\n")
+            with open(os.path.join(dir, "dynamic.txt"), "w") as f:
+                f.write("1 2\n0.01\n1.0\n0.02\n0.5\n")
+
+            concurrent.futures.wait(_Pipeline.submitted)
+            yield dir
+
+    return execute_batch
+
+
+def _sweep(tmp_path, store, completed=()):
+    dampened_oscillator.execute_simulations(
+        100,
+        10000,
+        70,
+        1,
+        ["verlet"],
+        DTS,
+        0.02,
+        cache_dir=str(tmp_path / "cache"),
+        completed=completed,
+        on_result=store.append_run,
+    )
+
+
+def test_killed_sweep_resumes_from_journal(tmp_path, monkeypatch):
+    results = str(tmp_path / "results")
+    monkeypatch.setattr(pipeline, "AnalysisPipeline", _Pipeline)
+
+    monkeypatch.setattr(
+        dampened_oscillator,
+        "execute_batch",
+        _fake_batch(str(tmp_path / "killed"), die_after=3),
+    )
+    with pytest.raises(Killed):
+        _sweep(tmp_path, results_store.open_store(results))
+
+    # The runs handed over before the one in flight were journaled
+    store = results_store.open_store(results, resume=True)
+    completed = {(run["integrator"], run["dt"]) for run in store.runs()}
+    assert len(completed) == 2
+
+    ran = []
+    monkeypatch.setattr(
+        dampened_oscillator,
+        "execute_batch",
+        _fake_batch(str(tmp_path / "resumed"), ran=ran),
+    )
+    _sweep(tmp_path, store, completed)
+
+    assert len(ran) == len(DTS) - 2
+    assert len(store.runs()) == len(DTS)
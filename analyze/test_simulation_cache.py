@@ -0,0 +1,42 @@
+import os
+import utils
+import simulation_cache
+
+
+def _entry(root, name, last_used):
+    entry_dir = os.path.join(root, name)
+    os.makedirs(entry_dir)
+
+    dynamic_file = os.path.join(entry_dir, "dynamic.txt")
+    with open(dynamic_file, "w") as f:
+        f.write("2 50\n")
+        for i in range(50):
+            f.write(f"{i * 0.01}\n{i}\n{-i}\n")
+
+    utils.parse_dynamic_file(dynamic_file, max_workers=1)
+    os.utime(os.path.join(entry_dir, "dynamic.meta.json"), (last_used, last_used))
+
+    return entry_dir
+
+
+def test_prune_caps_parsed_trajectories(tmp_path):
+    root = str(tmp_path)
+    old = _entry(root, "old", 1000)
+    new = _entry(root, "new", 2000)
+    size = os.path.getsize(os.path.join(new, "dynamic.npy"))
+
+    cache = simulation_cache.SimulationCache(root, trajectory_max_bytes=size)
+    cache.prune()
+
+    # The least recently used trajectory goes, the outputs stay
+    assert not os.path.exists(os.path.join(old, "dynamic.npy"))
+    assert not os.path.exists(os.path.join(old, "dynamic.meta.json"))
+    assert os.path.exists(os.path.join(old, "dynamic.txt"))
+    assert os.path.exists(os.path.join(new, "dynamic.npy"))
+
+    # And is parsed again from the text file next time
+    time, positions = utils.parse_dynamic_file(
+        os.path.join(old, "dynamic.txt"), max_workers=1
+    )
+    assert positions.shape == (50, 2)
+    assert os.path.exists(os.path.join(old, "dynamic.npy"))
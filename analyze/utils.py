@@ -1,14 +1,212 @@
+import os
+import json
+import collections
+import concurrent.futures
 import numpy as np
+from scipy import fft
+import metrics
+import normal_modes
 
+# Bytes decoded per read when parsing dynamic.txt
+DYNAMIC_CHUNK_SIZE = 16 * 1024 * 1024
 
-def parse_dynamic_file(path="dynamic.txt"):
-    with open(path, "r") as f:
-        num_particles, num_times = map(int, f.readline().strip().split())
+# Files bigger than this are split by byte offset across a process pool
+PARALLEL_PARSE_THRESHOLD = 64 * 1024 * 1024
+
+
+def _read_dynamic_header(path):
+    with open(path, "rb") as f:
+        num_particles, num_times = map(int, f.readline().split())
+        data_offset = f.tell()
+
+    return num_particles, num_times, data_offset
+
+
+# Byte offsets (aligned to the start of a line) splitting the data section
+def _split_byte_ranges(path, data_offset, parts):
+    size = os.path.getsize(path)
+    step = max((size - data_offset) // parts, 1)
+
+    bounds = [data_offset]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(data_offset + i * step)
+            f.readline()
+            offset = min(f.tell(), size)
+            if offset > bounds[-1]:
+                bounds.append(offset)
+
+    if bounds[-1] < size:
+        bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _decode_values(text, dtype):
+    return np.array(text.split(), dtype=np.float64).astype(dtype, copy=False)
+
+
+# Decodes every value in [start, end) reading chunk_size bytes at a time,
+# yielding one array per chunk. A line cut by the chunk boundary is carried
+# over to the next chunk.
+def _iter_byte_range(path, start, end, dtype=np.float64, chunk_size=DYNAMIC_CHUNK_SIZE):
+    carry = b""
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+            chunk = carry + chunk
+            cut = chunk.rfind(b"\n") + 1 if remaining > 0 else len(chunk)
+            carry = chunk[cut:]
+
+            if cut > 0:
+                yield _decode_values(chunk[:cut], dtype)
+
+        if carry:
+            yield _decode_values(carry, dtype)
+
+
+def _parse_byte_range(
+    path, start, end, dtype=np.float64, chunk_size=DYNAMIC_CHUNK_SIZE
+):
+    values = list(_iter_byte_range(path, start, end, dtype, chunk_size))
+
+    if not values:
+        return np.empty(0, dtype=dtype)
+
+    return np.concatenate(values)
+
+
+# Parsed trajectories are cached next to dynamic.txt as a .npy matrix (time in
+# the first column, positions in the rest) plus a metadata file recording the
+# size and mtime of the text file it was parsed from.
+def _trajectory_cache_paths(path):
+    base = os.path.splitext(path)[0]
+    return base + ".npy", base + ".meta.json"
+
+
+def _load_trajectory_cache(path, dtype):
+    cache_file, meta_file = _trajectory_cache_paths(path)
+
+    try:
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
 
-    data = np.loadtxt(path, skiprows=1)
+        stat = os.stat(path)
+        if (
+            meta["size"] != stat.st_size
+            or meta["mtime_ns"] != stat.st_mtime_ns
+            or meta["dtype"] != np.dtype(dtype).str
+        ):
+            return None
 
-    # Reshape the data: each time step includes 1 time value + num_particles positions
-    data = data.reshape((num_times, num_particles + 1))
+        data = np.load(cache_file, mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # Touch the metadata file so eviction can pick the least recently used
+    os.utime(meta_file)
+
+    return data
+
+
+def _write_trajectory_cache(path, data):
+    cache_file, meta_file = _trajectory_cache_paths(path)
+    stat = os.stat(path)
+
+    try:
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_file, cache_file)
+
+        with open(meta_file, "w") as f:
+            json.dump(
+                {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "dtype": data.dtype.str,
+                },
+                f,
+            )
+    except OSError as e:
+        print(f"Error writing trajectory cache for {path}: {e}")
+
+
+# Deletes the least recently used trajectory caches under root until their
+# total size is at most max_bytes
+def prune_trajectory_cache(root, max_bytes):
+    entries = []
+
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if not file_name.endswith(".meta.json"):
+                continue
+
+            meta_file = os.path.join(dir_path, file_name)
+            cache_file = meta_file[: -len(".meta.json")] + ".npy"
+
+            try:
+                size = os.path.getsize(cache_file)
+                last_used = os.path.getmtime(meta_file)
+            except OSError:
+                continue
+
+            entries.append((last_used, size, cache_file, meta_file))
+
+    total = sum(size for _, size, _, _ in entries)
+
+    for _, size, cache_file, meta_file in sorted(entries):
+        if total <= max_bytes:
+            break
+
+        for file in (meta_file, cache_file):
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+        total -= size
+
+    return total
+
+
+def parse_dynamic_file(
+    path="dynamic.txt", dtype=np.float64, max_workers=None, cache=True
+):
+    data = _load_trajectory_cache(path, dtype) if cache else None
+
+    if data is None:
+        num_particles, num_times, data_offset = _read_dynamic_header(path)
+
+        size = os.path.getsize(path)
+        workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+        if workers > 1 and size >= PARALLEL_PARSE_THRESHOLD:
+            ranges = _split_byte_ranges(path, data_offset, workers)
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers
+            ) as executor:
+                futures = [
+                    executor.submit(_parse_byte_range, path, start, end, dtype)
+                    for start, end in ranges
+                ]
+                data = np.concatenate([future.result() for future in futures])
+        else:
+            data = _parse_byte_range(path, data_offset, size, dtype)
+
+        # Reshape the data: each time step includes 1 time value + num_particles positions
+        data = data.reshape((num_times, num_particles + 1))
+
+        if cache:
+            _write_trajectory_cache(path, data)
 
     # First column is time, the rest are positions
     time = data[:, 0]
@@ -17,6 +215,232 @@ def parse_dynamic_file(path="dynamic.txt"):
     return time, positions
 
 
+# Yields (t, positions) for every snapshot in dynamic.txt or, when block_size
+# is given, (times, positions) blocks of up to block_size snapshots. Only one
+# block is kept in memory at a time.
+def iter_dynamic_file(path="dynamic.txt", block_size=None, dtype=np.float64):
+    rows = block_size if block_size is not None else 1
+
+    cached = _load_trajectory_cache(path, dtype)
+    if cached is not None:
+        blocks = (cached[i : i + rows] for i in range(0, len(cached), rows))
+    else:
+        blocks = _iter_dynamic_blocks(path, rows, dtype)
+
+    for block in blocks:
+        if block_size is None:
+            yield block[0, 0], block[0, 1:]
+        else:
+            yield block[:, 0], block[:, 1:]
+
+
+def _iter_dynamic_blocks(path, rows, dtype):
+    num_particles, _, data_offset = _read_dynamic_header(path)
+    row_length = num_particles + 1
+
+    # Roughly 32 bytes per value in the text file
+    chunk_size = max(rows * row_length * 32, 64 * 1024)
+
+    pending = np.empty(0, dtype=dtype)
+    for values in _iter_byte_range(
+        path, data_offset, os.path.getsize(path), dtype, chunk_size
+    ):
+        pending = np.concatenate([pending, values])
+
+        complete = (len(pending) // (rows * row_length)) * rows * row_length
+        if complete > 0:
+            for block in pending[:complete].reshape((-1, rows, row_length)):
+                yield block
+            pending = pending[complete:]
+
+    if len(pending) >= row_length:
+        yield pending[: len(pending) // row_length * row_length].reshape(
+            (-1, row_length)
+        )
+
+
+# One-pass reductions over a stream of snapshot blocks: system amplitude and
+# RMS per snapshot, running envelope (max amplitude so far) and per-particle
+# extrema
+class SnapshotReducer:
+    def __init__(self):
+        self.times = []
+        self.amplitudes = []
+        self.rms = []
+        self.envelope = []
+        self.particle_min = None
+        self.particle_max = None
+
+    def update(self, times, positions):
+        times = np.atleast_1d(times)
+        positions = np.atleast_2d(positions)
+
+        if len(times) == 0:
+            return
+
+        amplitudes = metrics.system_amplitudes(positions)
+        envelope = np.maximum.accumulate(amplitudes)
+        if self.envelope:
+            envelope = np.maximum(envelope, self.envelope[-1][-1])
+
+        self.times.append(np.array(times))
+        self.amplitudes.append(amplitudes)
+        self.rms.append(np.sqrt(np.mean(np.square(positions), axis=1)))
+        self.envelope.append(envelope)
+
+        block_min = np.min(positions, axis=0)
+        block_max = np.max(positions, axis=0)
+
+        if self.particle_min is None:
+            self.particle_min = block_min
+            self.particle_max = block_max
+        else:
+            self.particle_min = np.minimum(self.particle_min, block_min)
+            self.particle_max = np.maximum(self.particle_max, block_max)
+
+    def result(self):
+        def join(arrays):
+            return np.concatenate(arrays) if arrays else np.empty(0)
+
+        envelope = join(self.envelope)
+
+        return {
+            "time": join(self.times),
+            "amplitudes": join(self.amplitudes),
+            "rms": join(self.rms),
+            "envelope": envelope,
+            "max_amplitude": envelope[-1] if len(envelope) > 0 else 0.0,
+            "particle_min": self.particle_min,
+            "particle_max": self.particle_max,
+        }
+
+
+# Projects a stream of snapshot blocks of the chain (its N - 1 free particles
+# between the driver and the wall) onto its first modes normal modes. The mode
+# shapes of this chain are sines, so the modal coordinates q of a block are its
+# orthonormal DST-I across particles. Keeps the energy of each mode per
+# snapshot, m / 2 (q'^2 + w^2 q^2), with q' from central differences as in
+# metrics.kinetic_energy; the last snapshot of each block waits for the next
+# one, so the result does not depend on the block size.
+class ModalReducer:
+    def __init__(self, k, m, N, modes=None):
+        self.m = m
+        self.modes = modes if modes is not None else N - 1
+        self.frequencies = normal_modes.normal_frequencies(k, m, N)[: self.modes]
+        self.started = False
+        self.tail_times = np.empty(0)
+        self.tail = np.empty((0, self.modes))
+        self.times = []
+        self.energies = []
+
+    def _energies(self, q, velocities):
+        return 0.5 * self.m * (np.square(velocities) + np.square(self.frequencies * q))
+
+    def update(self, times, positions):
+        times = np.atleast_1d(times)
+        positions = np.atleast_2d(positions)
+
+        if len(times) == 0:
+            return
+
+        q = fft.dst(positions, type=1, axis=1, norm="ortho")[:, : self.modes]
+        times = np.concatenate([self.tail_times, times])
+        q = np.concatenate([self.tail, q])
+
+        if not self.started and len(times) >= 2:
+            # Forward difference for the first snapshot of the run
+            self.times.append(times[:1])
+            self.energies.append(
+                self._energies(q[:1], (q[1:2] - q[:1]) / (times[1] - times[0]))
+            )
+            self.started = True
+
+        if self.started and len(times) >= 3:
+            velocities = (q[2:] - q[:-2]) / (times[2:] - times[:-2])[:, None]
+            self.times.append(times[1:-1])
+            self.energies.append(self._energies(q[1:-1], velocities))
+
+        self.tail_times = times[-2:]
+        self.tail = q[-2:]
+
+    def result(self):
+        times = list(self.times)
+        energies = list(self.energies)
+
+        # The last snapshot, with a backward difference
+        if self.started:
+            times.append(self.tail_times[-1:])
+            energies.append(
+                self._energies(
+                    self.tail[-1:],
+                    (self.tail[-1:] - self.tail[-2:-1])
+                    / (self.tail_times[-1] - self.tail_times[-2]),
+                )
+            )
+        elif len(self.tail_times) > 0:
+            times.append(self.tail_times)
+            energies.append(self._energies(self.tail, np.zeros_like(self.tail)))
+
+        energies = np.concatenate(energies) if energies else np.empty((0, self.modes))
+
+        return {
+            "time": np.concatenate(times) if times else np.empty(0),
+            "mode_energies": energies,
+            # Amplitude of each mode's oscillation, from its energy
+            "mode_amplitudes": np.sqrt(
+                2 * energies / (self.m * np.square(self.frequencies))
+            ),
+        }
+
+
+# reducers are more reducers (e.g. ModalReducer) fed with the same blocks
+def reduce_dynamic_file(path="dynamic.txt", block_size=1024, reducers=()):
+    reducer = SnapshotReducer()
+
+    for times, positions in iter_dynamic_file(path, block_size=block_size):
+        reducer.update(times, positions)
+        for extra in reducers:
+            extra.update(times, positions)
+
+    return reducer.result()
+
+
+# Follows the envelope (max amplitude so far) of a run snapshot by snapshot and
+# tells when it can be stopped: "converged" once the envelope grew by less
+# than tolerance (relative) over the last window seconds, "diverged" once an
+# amplitude goes past limit or stops being finite
+class EnvelopeMonitor:
+    def __init__(self, window, tolerance=1e-3, limit=np.inf):
+        self.window = window
+        self.tolerance = tolerance
+        self.limit = limit
+        self.envelope = 0.0
+        self.status = None
+
+        # (time, envelope) over the last window
+        self.history = collections.deque()
+
+    def update(self, time, amplitude):
+        if not np.isfinite(amplitude) or amplitude > self.limit:
+            self.status = "diverged"
+            return self.status
+
+        self.envelope = max(self.envelope, amplitude)
+        self.history.append((time, self.envelope))
+
+        while len(self.history) > 1 and time - self.history[1][0] >= self.window:
+            self.history.popleft()
+
+        start, envelope = self.history[0]
+        if (
+            time - start >= self.window
+            and self.envelope - envelope <= self.tolerance * self.envelope
+        ):
+            self.status = "converged"
+
+        return self.status
+
+
 def parse_static_file_dampened(path="static.txt"):
     with open(path, "r") as f:
         lines = f.readlines()
@@ -73,47 +497,60 @@ def parse_static_file_coupled(path="static.txt"):
     }
 
 
-# Positions is a 2D NumPy array where each row represents a snapshot in time
-def calculate_amplitudes(positions):
-    # Return the maximum distance to equilibrium for each time snapshot
+# Mirrors the time loop in Simulation.java, which accumulates both t and the
+# time since the last snapshot by repeatedly adding dt. Returns the number of
+# integration steps and the number of steps between snapshots (the first
+# snapshot is taken after period + 1 steps), or None if there are none.
+def simulation_schedule(dt, dt2, tf):
+    steps = int(max(tf, dt2) / dt) + 2
+    elapsed = np.cumsum(np.full(steps, dt))
+
+    while elapsed[-1] < max(tf, dt2):
+        steps *= 2
+        elapsed = np.cumsum(np.full(steps, dt))
 
-    system_amplitudes = []
+    iterations = 1 + int(np.count_nonzero(elapsed < tf))
+    period = 1 + int(np.argmax(elapsed >= dt2))
 
-    for snapshot in positions:
-        # Calculate the amplitude for each particle in the snapshot
-        particle_amplitudes = [abs(pos) for pos in snapshot]
-        system_amplitudes.append(max(particle_amplitudes))
+    if period >= iterations:
+        return iterations, None
 
-    return system_amplitudes
+    return iterations, period
+
+
+# Times of the snapshots of a run as the integrators reach them, dt being added
+# once per step, rather than the nominal multiples of dt2 in dynamic.txt
+def snapshot_times(dt, dt2, tf):
+    iterations, period = simulation_schedule(dt, dt2, tf)
+    if not period:
+        return np.empty(0)
+
+    elapsed = np.cumsum(np.full(iterations, dt))
+    return elapsed[np.arange(1, (iterations - 1) // period + 1) * period]
 
 
 # Para generar frecuencias para graficar
 # mayor numero de frecuencias cerca de wo y sus armonicos
-def generate_frequencies(k, m, N, num_points=1000):
-    harmonics = [
-        2 * (np.sqrt(k) / np.sqrt(m)) * np.sin((n * np.pi) / (2 * N))
-        for n in range(1, 4)
-    ]
+# Los armonicos son los tres primeros modos normales exactos (normal_modes),
+# guardados en root si se indica
+def generate_frequencies(k, m, N, num_points=1000, root=None):
+    harmonics = normal_modes.normal_frequencies(k, m, N, root)[:3]
 
     # Definir proporciones de puntos: 1/5 para cada armónico, 2/5 para el resto del rango
     points_per_harmonic = num_points // 5
     remaining_points = num_points - 3 * points_per_harmonic
 
-    frequencies = []
-
     # Generar puntos alrededor de cada armónico (espejado desde el armónico)
-    for harmonic in harmonics:
-        delta = 0.05 * harmonic if k < 100 else 0.01 * harmonic
-        freqs_near_harmonic = np.linspace(
-            harmonic - delta, harmonic + delta, points_per_harmonic
-        )
-        frequencies.extend(freqs_near_harmonic)
+    deltas = (0.05 if k < 100 else 0.01) * harmonics
+    near_harmonics = np.linspace(
+        harmonics - deltas, harmonics + deltas, points_per_harmonic
+    )
 
     # Generar los puntos restantes entre 0.5 y 3.5 veces el primer armónico
-    min_freq = 0.5 * harmonics[0]
-    max_freq = 3.5 * harmonics[0]
-    remaining_freqs = np.linspace(min_freq, max_freq, remaining_points)
-    frequencies.extend(remaining_freqs)
-    frequencies.extend(harmonics)
+    remaining_freqs = np.linspace(
+        0.5 * harmonics[0], 3.5 * harmonics[0], remaining_points
+    )
+
+    frequencies = np.concatenate([near_harmonics.ravel(), remaining_freqs, harmonics])
 
-    return np.sort(np.unique(np.array(frequencies))), harmonics
+    return np.unique(frequencies), harmonics
@@ -1,5 +1,7 @@
 package ar.edu.itba.ss.g2.coupled.config;
 
+import ar.edu.itba.ss.g2.utils.JobRunner;
+
 import org.apache.commons.cli.CommandLine;
 import org.apache.commons.cli.CommandLineParser;
 import org.apache.commons.cli.DefaultParser;
@@ -30,6 +32,13 @@ public class ArgParser {
                             true,
                             "Movement integration scheme (beeman | verlet | gear)"),
                     new Option("out", "output", true, "Output directory"),
+                    new Option(
+                            "stream",
+                            "stream",
+                            false,
+                            "Stream snapshots to stdout instead of writing output files"),
+                    JobRunner.JOBS_OPTION,
+                    JobRunner.THREADS_OPTION,
                     new Option("h", "help", false, "Print help"));
 
     private final String[] args;
@@ -69,8 +78,10 @@ public class ArgParser {
                     || !cmd.hasOption("dt")
                     || !cmd.hasOption("dt2")
                     || !cmd.hasOption("i")
-                    || !cmd.hasOption("out")) {
-                System.out.println("Error: Missing parameters. All parameters are required.");
+                    || (!cmd.hasOption("out") && !cmd.hasOption("stream"))) {
+                System.out.println(
+                        "Error: Missing parameters. All parameters are required (-out is not"
+                                + " needed with -stream).");
                 return null;
             }
 
@@ -157,6 +168,7 @@ public class ArgParser {
             builder.setIntegrator(integrator);
 
             builder.setOutputDir(cmd.getOptionValue("out"));
+            builder.setStream(cmd.hasOption("stream"));
 
             // Build and return the configuration object
             return builder.build();
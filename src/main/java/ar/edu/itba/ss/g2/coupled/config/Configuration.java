@@ -15,6 +15,8 @@ public class Configuration {
 
     private final String outputDir;
 
+    private final boolean stream;
+
     private Configuration(Builder builder) {
         this.m = builder.m;
         this.k = builder.k;
@@ -29,6 +31,8 @@ public class Configuration {
         this.integrator = builder.integrator;
         
         this.outputDir = builder.outputDir;
+
+        this.stream = builder.stream;
     }
 
     public double getM() {
@@ -75,6 +79,10 @@ public class Configuration {
         return outputDir;
     }
 
+    public boolean isStream() {
+        return stream;
+    }
+
     public static class Builder {
         private double m;
         private double k;
@@ -90,6 +98,8 @@ public class Configuration {
 
         private String outputDir;
 
+        private boolean stream;
+
         public Builder setM(double m) {
             this.m = m;
             return this;
@@ -145,6 +155,11 @@ public class Configuration {
             return this;
         }
 
+        public Builder setStream(boolean stream) {
+            this.stream = stream;
+            return this;
+        }
+
         public Configuration build() {
             return new Configuration(this);
         }
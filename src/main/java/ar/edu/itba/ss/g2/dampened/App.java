@@ -11,13 +11,21 @@ import ar.edu.itba.ss.g2.simulation.integrators.GearIntegrator;
 import ar.edu.itba.ss.g2.simulation.integrators.MovementIntegrator;
 import ar.edu.itba.ss.g2.simulation.integrators.VerletIntegrator;
 import ar.edu.itba.ss.g2.utils.FileUtil;
+import ar.edu.itba.ss.g2.utils.JobRunner;
 
 import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
 import java.util.List;
 
 public class App {
     public static void main(String[] args) {
 
+        // Many runs in one JVM, see JobRunner
+        if (JobRunner.isBatch(args)) {
+            System.exit(JobRunner.run(args, App::runJob));
+        }
+
         ArgParser parser = new ArgParser(args);
         Configuration configuration = parser.parse();
 
@@ -26,6 +34,31 @@ public class App {
             System.exit(1);
         }
 
+        try {
+            simulate(configuration, System.out);
+        } catch (IllegalArgumentException e) {
+            System.err.println(e.getMessage());
+            System.exit(1);
+        } catch (IOException e) {
+            System.err.println("Error writing output files: " + e.getMessage());
+            System.exit(1);
+        }
+    }
+
+    private static void runJob(String[] args) throws IOException {
+        Configuration configuration = new ArgParser(args).parse();
+
+        if (configuration == null) {
+            throw new IllegalArgumentException("Invalid job: " + String.join(" ", args));
+        }
+
+        // The progress of runs executed at once would interleave
+        simulate(configuration, new PrintStream(OutputStream.nullOutputStream()));
+    }
+
+    private static void simulate(Configuration configuration, PrintStream progressStream)
+            throws IOException {
+
         double k = configuration.getK();
         double gamma = configuration.getGamma();
         double m = configuration.getM();
@@ -71,23 +104,18 @@ public class App {
                 integrator = new AnaliticSolution(List.of(particle), analiticSolution, dt);
                 break;
             default:
-                System.err.println("Invalid integrator: " + configuration.getIntegrator());
-                System.exit(1);
-                return;
+                throw new IllegalArgumentException(
+                        "Invalid integrator: " + configuration.getIntegrator());
         }
 
         Simulation simulation = new Simulation(dt, dt2, integrator);
+        simulation.setProgressStream(progressStream);
         simulation.run(tf);
 
         List<List<Double>> snapshots = simulation.getSnapshots();
         String outputDir = configuration.getOutputDir();
 
-        try {
-            FileUtil.serializeStaticDampened(configuration);
-            FileUtil.serializeDynamic(snapshots, outputDir, dt2);
-        } catch (IOException e) {
-            System.err.println("Error writing output files: " + e.getMessage());
-            System.exit(1);
-        }
+        FileUtil.serializeStaticDampened(configuration);
+        FileUtil.serializeDynamic(snapshots, outputDir, dt2, progressStream);
     }
 }
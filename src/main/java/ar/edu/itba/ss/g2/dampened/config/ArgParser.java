@@ -1,5 +1,7 @@
 package ar.edu.itba.ss.g2.dampened.config;
 
+import ar.edu.itba.ss.g2.utils.JobRunner;
+
 import org.apache.commons.cli.CommandLine;
 import org.apache.commons.cli.CommandLineParser;
 import org.apache.commons.cli.DefaultParser;
@@ -27,6 +29,8 @@ public class ArgParser {
                             true,
                             "Movement integration scheme (beeman | verlet | gear)"),
                     new Option("out", "output", true, "Output directory"),
+                    JobRunner.JOBS_OPTION,
+                    JobRunner.THREADS_OPTION,
                     new Option("h", "help", false, "Print help"));
 
     private final String[] args;
@@ -3,6 +3,7 @@ package ar.edu.itba.ss.g2.simulation;
 import ar.edu.itba.ss.g2.model.Particle;
 import ar.edu.itba.ss.g2.simulation.integrators.MovementIntegrator;
 
+import java.io.PrintStream;
 import java.util.LinkedList;
 import java.util.List;
 
@@ -15,6 +16,9 @@ public class Simulation {
 
     private final List<List<Double>> snapshots;
 
+    private SnapshotConsumer snapshotConsumer;
+    private PrintStream progressStream = System.out;
+
     public Simulation(double timeStep, double snapshotStep, MovementIntegrator integrator) {
         this.timeStep = timeStep;
         this.snapshotStep = snapshotStep;
@@ -22,6 +26,15 @@ public class Simulation {
         this.snapshots = new LinkedList<>();
     }
 
+    // Snapshots are handed to the consumer instead of being kept in memory
+    public void setSnapshotConsumer(SnapshotConsumer snapshotConsumer) {
+        this.snapshotConsumer = snapshotConsumer;
+    }
+
+    public void setProgressStream(PrintStream progressStream) {
+        this.progressStream = progressStream;
+    }
+
     public void run(double maxTime) {
 
         int printElapsed = 0;
@@ -33,12 +46,16 @@ public class Simulation {
 
             printElapsed++;
             if (printElapsed >= printStep) {
-                System.out.println(String.format("Progress: %.2f/%.2f", t, maxTime));
+                progressStream.println(String.format("Progress: %.2f/%.2f", t, maxTime));
                 printElapsed = 0;
             }
 
             if (elapsed >= snapshotStep) {
-                snapshots.add(integrator.getState());
+                if (snapshotConsumer == null) {
+                    snapshots.add(integrator.getState());
+                } else if (!snapshotConsumer.accept(integrator.getState())) {
+                    break;
+                }
                 elapsed = 0;
             }
         }
@@ -0,0 +1,10 @@
+package ar.edu.itba.ss.g2.simulation;
+
+import java.util.List;
+
+@FunctionalInterface
+public interface SnapshotConsumer {
+
+    // Returns false to stop the simulation
+    boolean accept(List<Double> state);
+}
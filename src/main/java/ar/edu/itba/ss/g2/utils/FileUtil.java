@@ -6,6 +6,7 @@ import java.io.BufferedWriter;
 import java.io.File;
 import java.io.FileWriter;
 import java.io.IOException;
+import java.io.PrintStream;
 import java.text.DecimalFormat;
 import java.util.List;
 
@@ -65,9 +66,15 @@ public class FileUtil {
         }
     }
 
-    public static void serializeDynamic(List<List<Double>> snapshots, String directory, Double dt)
+    // Progress goes to progressStream, which batch runs silence so it does not
+    // mix with the job statuses on stdout
+    public static void serializeDynamic(
+            List<List<Double>> snapshots,
+            String directory,
+            Double dt,
+            PrintStream progressStream)
             throws IOException {
-        System.out.println("Writing...");
+        progressStream.println("Writing...");
         try (BufferedWriter writer =
                 new BufferedWriter(new FileWriter(directory + "/dynamic.txt"))) {
 
@@ -87,7 +94,7 @@ public class FileUtil {
 
                 elapsed++;
                 if (elapsed >= printStep) {
-                    System.out.println("Progress: " + (i + 1) + "/" + snapshots.size());
+                    progressStream.println("Progress: " + (i + 1) + "/" + snapshots.size());
                     elapsed = 0;
                 }
 
@@ -0,0 +1,101 @@
+package ar.edu.itba.ss.g2.utils;
+
+import org.apache.commons.cli.CommandLine;
+import org.apache.commons.cli.DefaultParser;
+import org.apache.commons.cli.Option;
+import org.apache.commons.cli.Options;
+import org.apache.commons.cli.ParseException;
+
+import java.io.IOException;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.util.Arrays;
+import java.util.List;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicInteger;
+
+// Batch mode of both simulations: every line of the job file holds the options
+// of one run, as given on the command line (-out included) but separated by
+// tabs, so paths may contain spaces. The runs share one JVM and are executed in
+// file order by a fixed pool of threads. The outcome of each run is printed to
+// stdout as "JOB <line> OK" or "JOB <line> FAILED <reason>", lines counted
+// from 0.
+public class JobRunner {
+
+    public static final Option JOBS_OPTION =
+            new Option("jobs", "jobs", true, "Job file, one run per line (batch mode)");
+    public static final Option THREADS_OPTION =
+            new Option(
+                    "threads",
+                    "threads",
+                    true,
+                    "Runs executed at once in batch mode (defaults to the cores)");
+
+    @FunctionalInterface
+    public interface Job {
+        void run(String[] args) throws Exception;
+    }
+
+    public static boolean isBatch(String[] args) {
+        return Arrays.asList(args).contains("-" + JOBS_OPTION.getOpt());
+    }
+
+    // Runs every job of the file given with -jobs and returns the exit code of
+    // the process: 0 if all of them succeeded, 1 otherwise
+    public static int run(String[] args, Job job) {
+        Options options = new Options();
+        options.addOption(JOBS_OPTION);
+        options.addOption(THREADS_OPTION);
+
+        List<String> lines;
+        int threads;
+
+        try {
+            CommandLine cmd = new DefaultParser().parse(options, args);
+            lines = Files.readAllLines(Path.of(cmd.getOptionValue(JOBS_OPTION.getOpt())));
+            threads =
+                    cmd.hasOption(THREADS_OPTION.getOpt())
+                            ? Integer.parseInt(cmd.getOptionValue(THREADS_OPTION.getOpt()))
+                            : Runtime.getRuntime().availableProcessors();
+        } catch (ParseException | IOException | NumberFormatException e) {
+            System.out.println("Error: Invalid batch arguments. " + e.getMessage());
+            return 1;
+        }
+
+        ExecutorService executor = Executors.newFixedThreadPool(Math.max(threads, 1));
+        AtomicInteger failed = new AtomicInteger();
+
+        for (int i = 0; i < lines.size(); i++) {
+            String line = lines.get(i).strip();
+            if (line.isEmpty()) {
+                continue;
+            }
+
+            int index = i;
+            executor.execute(
+                    () -> {
+                        try {
+                            job.run(line.split("\t"));
+                            System.out.println("JOB " + index + " OK");
+                        } catch (Throwable e) {
+                            // Errors too (e.g. OutOfMemoryError), so every line
+                            // reports its outcome
+                            failed.incrementAndGet();
+                            System.out.println("JOB " + index + " FAILED " + e);
+                        }
+                    });
+        }
+
+        executor.shutdown();
+        try {
+            executor.awaitTermination(Long.MAX_VALUE, TimeUnit.NANOSECONDS);
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            return 1;
+        }
+
+        return failed.get() == 0 ? 0 : 1;
+    }
+}
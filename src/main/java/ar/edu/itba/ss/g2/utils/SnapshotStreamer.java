@@ -0,0 +1,40 @@
+package ar.edu.itba.ss.g2.utils;
+
+import ar.edu.itba.ss.g2.simulation.SnapshotConsumer;
+
+import java.io.BufferedOutputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.util.List;
+
+// Writes each snapshot as one line, "t x1 x2 ... xn", flushed right away so the
+// reading side can follow the simulation. Stops the simulation once the reader
+// goes away.
+public class SnapshotStreamer implements SnapshotConsumer {
+
+    private final PrintStream out;
+    private final double dt;
+
+    private int count = 0;
+
+    public SnapshotStreamer(OutputStream out, double dt) {
+        this.out = new PrintStream(new BufferedOutputStream(out, 1 << 16), false);
+        this.dt = dt;
+    }
+
+    @Override
+    public boolean accept(List<Double> state) {
+        count++;
+
+        StringBuilder line = new StringBuilder();
+        line.append(count * dt);
+        for (Double position : state) {
+            line.append(' ').append(position);
+        }
+
+        out.println(line);
+        out.flush();
+
+        return !out.checkError();
+    }
+}
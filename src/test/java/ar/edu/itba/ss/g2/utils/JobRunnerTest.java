@@ -0,0 +1,97 @@
+package ar.edu.itba.ss.g2.utils;
+
+import static org.junit.jupiter.api.Assertions.assertArrayEquals;
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertTrue;
+
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.BeforeEach;
+import org.junit.jupiter.api.Test;
+import org.junit.jupiter.api.io.TempDir;
+
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.PrintStream;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
+
+public class JobRunnerTest {
+
+    @TempDir Path dir;
+
+    private final ByteArrayOutputStream output = new ByteArrayOutputStream();
+    private PrintStream stdout;
+
+    @BeforeEach
+    public void captureOutput() {
+        stdout = System.out;
+        System.setOut(new PrintStream(output, true));
+    }
+
+    @AfterEach
+    public void restoreOutput() {
+        System.setOut(stdout);
+    }
+
+    private String[] batch(String... lines) throws IOException {
+        Path jobs = dir.resolve("jobs.txt");
+        Files.write(jobs, List.of(lines));
+        return new String[] {"-jobs", jobs.toString(), "-threads", "2"};
+    }
+
+    private List<String> statusLines() {
+        return output.toString().lines().filter(line -> line.startsWith("JOB ")).toList();
+    }
+
+    @Test
+    public void runsEveryJobAndReportsTheInvalidOne() throws IOException {
+        Map<String, String[]> ran = new ConcurrentHashMap<>();
+
+        int code =
+                JobRunner.run(
+                        batch("-out\tdir with spaces\t-k\t1", "-out\tother\t-k\tx"),
+                        args -> {
+                            if (args[3].equals("x")) {
+                                throw new IllegalArgumentException("Invalid job");
+                            }
+                            ran.put(args[1], args);
+                        });
+
+        assertEquals(1, code);
+        assertArrayEquals(
+                new String[] {"-out", "dir with spaces", "-k", "1"}, ran.get("dir with spaces"));
+        assertEquals(1, ran.size());
+
+        List<String> lines = statusLines();
+        assertEquals(2, lines.size());
+        assertTrue(lines.contains("JOB 0 OK"));
+        assertTrue(lines.stream().anyMatch(line -> line.startsWith("JOB 1 FAILED")));
+    }
+
+    @Test
+    public void reportsErrorsAsFailures() throws IOException {
+        int code =
+                JobRunner.run(
+                        batch("-out\ta", "-out\tb"),
+                        args -> {
+                            if (args[1].equals("b")) {
+                                throw new OutOfMemoryError("Java heap space");
+                            }
+                        });
+
+        assertEquals(1, code);
+        assertTrue(statusLines().contains("JOB 0 OK"));
+        assertTrue(
+                statusLines().stream()
+                        .anyMatch(line -> line.startsWith("JOB 1 FAILED") && line.contains("heap")));
+    }
+
+    @Test
+    public void succeedsWhenEveryJobSucceeds() throws IOException {
+        assertEquals(0, JobRunner.run(batch("-out\ta", "", "-out\tb"), args -> {}));
+        assertEquals(List.of("JOB 0 OK", "JOB 2 OK"), statusLines().stream().sorted().toList());
+    }
+}